@@ -0,0 +1,302 @@
+import codecs
+import json
+import re
+
+from app.swagger_parser import SwaggerParser
+
+# Largest array item accepted by JSONArrayScanner [in characters]
+MAX_ITEM_SIZE = 16 * 1024 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*')
+
+
+class JSONArrayScanner(object):
+    """Decode a JSON array arriving in chunks, one item at a time.
+
+    Only the item being received is kept, never the whole array: the items
+    are yielded as soon as they are complete, so a huge array is decoded
+    in bounded memory.
+
+    Attributes:
+        items: number of items decoded.
+        max_item_size: largest item accepted [in characters].
+    """
+
+    _START = 'start'  # Before the opening bracket
+    _FIRST = 'first'  # After the opening bracket, an item or the closing bracket
+    _ITEM = 'item'  # After a comma, an item
+    _SEPARATOR = 'separator'  # After an item, a comma or the closing bracket
+    _END = 'end'  # After the closing bracket
+
+    def __init__(self, max_item_size=MAX_ITEM_SIZE):
+        self.items = 0
+        self.max_item_size = max_item_size
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._state = self._START
+        # Length of the buffer to wait for before decoding an incomplete item again
+        self._retry_at = 0
+
+    def feed(self, data):
+        """Add a chunk of the array.
+
+        Args:
+            data: next bytes of the array.
+
+        Returns:
+            Yield the items completed by the chunk.
+
+        Raises:
+            ValueError: if the data is not a JSON array.
+        """
+        self._buffer += self._text.decode(data)
+        return self._scan(final=False)
+
+    def close(self):
+        """End the array.
+
+        Returns:
+            Yield the last item, if it was not complete before the end.
+
+        Raises:
+            ValueError: if the array is incomplete or followed by other data.
+        """
+        self._buffer += self._text.decode(b'', final=True)
+        yield from self._scan(final=True)
+        if self._state != self._END:
+            raise ValueError(f"Incomplete JSON array after {self.items} items")
+
+    def _scan(self, final):
+        buffer = self._buffer
+        pos = 0
+        try:
+            while True:
+                pos = _WHITESPACE.match(buffer, pos).end()
+                if pos == len(buffer):
+                    break
+                char = buffer[pos]
+
+                if self._state == self._START:
+                    if char != '[':
+                        raise ValueError('The body is not a JSON array')
+                    pos += 1
+                    self._state = self._FIRST
+
+                elif self._state == self._SEPARATOR or (self._state == self._FIRST and char == ']'):
+                    if char == ']':
+                        self._state = self._END
+                    elif char != ',':
+                        raise ValueError(f"Expected ',' or ']' after item {self.items - 1}")
+                    else:
+                        self._state = self._ITEM
+                    pos += 1
+
+                elif self._state == self._END:
+                    raise ValueError('Data after the end of the JSON array')
+
+                else:  # An item
+                    if len(buffer) < self._retry_at and not final:
+                        break
+                    try:
+                        item, end = self._decoder.raw_decode(buffer, pos)
+                    except ValueError:
+                        if final:
+                            raise ValueError(f"Invalid JSON in item {self.items}")
+                        if len(buffer) - pos > self.max_item_size:
+                            raise ValueError(f"Item {self.items} is larger than {self.max_item_size} characters")
+                        # Wait for the incomplete item to double, so a large item is decoded a few times only
+                        self._retry_at = len(buffer) + len(buffer) - pos
+                        break
+                    if not final and (end == len(buffer) or (
+                            isinstance(item, (int, float)) and _NUMBER_TAIL.match(buffer, end).end() == len(buffer))):
+                        # A number or a literal may go on in the next chunk (ex: '1.' then '5')
+                        self._retry_at = len(buffer) + 1
+                        break
+                    self._retry_at = 0
+                    pos = end
+                    self._state = self._SEPARATOR
+                    self.items += 1
+                    yield item
+        finally:
+            # Keep the incomplete item only
+            self._buffer = buffer[pos:]
+            self._retry_at = max(self._retry_at - pos, 0)
+
+
+def iter_json_array(chunks, max_item_size=MAX_ITEM_SIZE):
+    """Decode the items of a JSON array arriving in chunks, see JSONArrayScanner.
+
+    Args:
+        chunks: iterable of the bytes of the array.
+        max_item_size: largest item accepted [in characters].
+
+    Returns:
+        Yield each item of the array.
+
+    Raises:
+        ValueError: if the data is not a JSON array.
+    """
+    scanner = JSONArrayScanner(max_item_size)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
+
+
+class ArrayValidation(object):
+    """Result of the validation of the items of an array response.
+
+    Attributes:
+        items: number of items checked.
+        failures: number of invalid items.
+        invalid_indices: indices of the first invalid items.
+        error: reason why the body is not a valid JSON array, None if it is.
+        size: number of bytes read.
+    """
+
+    __slots__ = ('items', 'failures', 'invalid_indices', 'error', 'size')
+
+    def __init__(self):
+        self.items = 0
+        self.failures = 0
+        self.invalid_indices = []
+        self.error = None
+        self.size = 0
+
+    @property
+    def valid(self):
+        return self.error is None and not self.failures
+
+    def __str__(self):
+        if self.error is not None:
+            return f"invalid array after {self.items} items: {self.error}"
+        if self.failures:
+            indices = ', '.join(str(index) for index in self.invalid_indices)
+            more = ', ...' if self.failures > len(self.invalid_indices) else ''
+            return f"{self.failures} of {self.items} items invalid at [{indices}{more}]"
+        return f"{self.items} items valid"
+
+
+def validate_json_array(chunks, check, max_failures=10):
+    """Validate each item of a JSON array as it arrives, in bounded memory.
+
+    Args:
+        chunks: iterable of the bytes of the array (ex: response.iter_content()).
+        check: function returning True if an item is valid.
+        max_failures: number of invalid item indices to report.
+
+    Returns:
+        An ArrayValidation.
+    """
+    validation = ArrayValidation()
+
+    def counted(chunks):
+        for chunk in chunks:
+            validation.size += len(chunk)
+            yield chunk
+
+    try:
+        for index, item in enumerate(iter_json_array(counted(chunks))):
+            validation.items += 1
+            try:
+                valid = check(item)
+            except Exception:  # The validators expect decoded JSON of the right shape
+                valid = False
+            if not valid:
+                validation.failures += 1
+                if len(validation.invalid_indices) < max_failures:
+                    validation.invalid_indices.append(index)
+    except ValueError as exc:
+        validation.error = str(exc)
+    return validation
+
+
+def array_item_definition(swagger_parser, resp_spec):
+    """Get the definition of the items of an array response.
+
+    Args:
+        swagger_parser: instance of SwaggerParser.
+        resp_spec: specification of the response.
+
+    Returns:
+        The name of the definition of the items, None if the response is not
+        an array of definitions.
+    """
+    if '$ref' in resp_spec:
+        resp_spec = swagger_parser.resolve_ref(resp_spec['$ref']) or {}
+    schema = resp_spec.get('schema') or {}
+    if '$ref' in schema:
+        schema = swagger_parser.resolve_ref(schema['$ref']) or {}
+    items = schema.get('items') if schema.get('type') == 'array' else None
+    if not isinstance(items, dict) or not isinstance(items.get('$ref'), str):
+        return None
+    definition_name = swagger_parser.get_definition_name_from_ref(items['$ref'])
+    return definition_name if definition_name in (swagger_parser.specification.get('definitions') or {}) else None
+
+
+def referenced_definitions(swagger_parser, definition_names):
+    """Get the given definitions and the ones they reference, recursively.
+
+    Args:
+        swagger_parser: instance of SwaggerParser.
+        definition_names: names of the definitions.
+
+    Returns:
+        A dict of definition specifications by name.
+    """
+    all_definitions = swagger_parser.specification.get('definitions') or {}
+    definitions = {}
+    pending = [name for name in definition_names if name in all_definitions]
+    while pending:
+        name = pending.pop()
+        if name in definitions:
+            continue
+        definitions[name] = all_definitions[name]
+        stack = [all_definitions[name]]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                ref = value.get('$ref')
+                if isinstance(ref, str):
+                    ref_name = swagger_parser.get_definition_name_from_ref(ref)
+                    if ref_name in all_definitions and ref_name not in definitions:
+                        pending.append(ref_name)
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+    return definitions
+
+
+class ItemValidators(object):
+    """Compiled validators of the array items of the responses of a test plan.
+
+    The validators are compiled from the definitions kept in the plan, so a
+    cached plan does not need the parsed specification.
+
+    Attributes:
+        max_failures: number of invalid item indices reported for a response.
+    """
+
+    def __init__(self, definitions, max_failures=10):
+        self.max_failures = max_failures
+        self._parser = SwaggerParser(swagger_dict={'paths': {}, 'definitions': dict(definitions)},
+                                     use_example=False, lazy=True)
+        # Compile everything now, the validators are then only read by the threads of the run
+        self._validators = dict((name, self._parser.get_definition_validator(name)) for name in definitions)
+
+    def get(self, test_request, status_code):
+        """Get the validator of the items of the response to a request.
+
+        Args:
+            test_request: PreparedRequest sent.
+            status_code: status code of the response.
+
+        Returns:
+            A function checking an item, None if the response is not an array of definitions.
+        """
+        for expected_status_code, definition_name in zip(test_request.expected_status_codes,
+                                                         test_request.item_definitions):
+            if definition_name is not None and str(expected_status_code) == str(status_code):
+                return self._validators.get(definition_name)
+        return None
@@ -0,0 +1,115 @@
+import asyncio
+import collections
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from urlparse import urlsplit
+except ImportError:  # Python 3
+    from urllib.parse import urlsplit
+
+
+async def run_concurrently(test_requests, send, concurrency=10, per_host_concurrency=None, in_order=False):
+    """Send test requests concurrently with asyncio.
+
+    The blocking send function runs in a thread pool, at most concurrency
+    requests are in flight, and at most per_host_concurrency for one host.
+    Different paths run in parallel, but the requests of one path are sent
+    one after the other in their given order (the _HTTP_METHODS order), as
+    with iter_by_path, so a resource is created before being read and deleted.
+
+    Args:
+        test_requests: iterable of PreparedRequest (or TestResult, passed through).
+        send: function sending a PreparedRequest and returning its result.
+        concurrency: maximum number of requests in flight.
+        per_host_concurrency: maximum number of requests in flight for one host
+                              (concurrency if None).
+        in_order: if True, yield the results in the order of test_requests,
+                  otherwise as they complete.
+
+    Returns:
+        Yield the result of each test.
+    """
+    loop = asyncio.get_running_loop()
+    global_semaphore = asyncio.Semaphore(concurrency)
+    host_semaphores = {}
+    # Last task scheduled for each path, the next request of the path waits for it
+    path_tasks = {}
+    # Only keep a bounded window of tests scheduled, not the whole run
+    window = concurrency * 2
+
+    async def run_one(test_request, previous):
+        if not hasattr(test_request, 'full_path'):  # Already a result
+            return test_request
+        if previous is not None:
+            # Wait without holding a semaphore, and whatever the outcome of the previous request
+            await asyncio.wait([previous])
+        host = urlsplit(test_request.full_path).netloc
+        host_semaphore = host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = host_semaphores[host] = asyncio.Semaphore(per_host_concurrency or concurrency)
+        async with host_semaphore:
+            async with global_semaphore:
+                return await loop.run_in_executor(executor, send, test_request)
+
+    def forget(path, task):
+        if path_tasks.get(path) is task:
+            del path_tasks[path]
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = collections.deque()
+    try:
+        for test_request in test_requests:
+            path = getattr(test_request, 'path', None)
+            task = loop.create_task(run_one(test_request, path_tasks.get(path)))
+            if path is not None:
+                path_tasks[path] = task
+                task.add_done_callback(functools.partial(forget, path))
+            pending.append(task)
+            if len(pending) >= window:
+                yield await _next_result(pending, in_order)
+        while pending:
+            yield await _next_result(pending, in_order)
+    finally:
+        for task in pending:
+            task.cancel()
+        executor.shutdown(wait=False)
+
+
+async def _next_result(pending, in_order):
+    """Wait for the next result of the pending tasks and remove its task."""
+    if in_order:
+        return await pending.popleft()
+    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    # Keep the order of the tests between the tasks done at the same time
+    task = next(task for task in pending if task in done)
+    pending.remove(task)
+    return task.result()
+
+
+def iter_concurrently(test_requests, send, concurrency=10, per_host_concurrency=None, in_order=False):
+    """Run run_concurrently in its own event loop, for synchronous callers.
+
+    Args:
+        test_requests: iterable of PreparedRequest (or TestResult, passed through).
+        send: function sending a PreparedRequest and returning its result.
+        concurrency: maximum number of requests in flight.
+        per_host_concurrency: maximum number of requests in flight for one host.
+        in_order: yield the results in the order of test_requests.
+
+    Returns:
+        Yield the result of each test.
+    """
+    loop = asyncio.new_event_loop()
+    results = run_concurrently(test_requests, send, concurrency=concurrency,
+                               per_host_concurrency=per_host_concurrency, in_order=in_order)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
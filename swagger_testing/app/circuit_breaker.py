@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+
+try:
+    from urlparse import urlsplit
+except ImportError:  # Python 3
+    from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker(object):
+    """Stop sending requests to a host which cannot be reached.
+
+    The circuit opens after failure_threshold connection failures in a row:
+    the requests are then refused at once. Once recovery_timeout seconds have
+    passed, a single probe request is let through (half-open state): the
+    circuit closes again if it reaches the host, and stays open otherwise.
+
+    Attributes:
+        host: host of the requests.
+        failure_threshold: number of connection failures in a row opening the circuit.
+        recovery_timeout: seconds to wait before probing the host again.
+        state: CLOSED, OPEN or HALF_OPEN.
+        failures: number of connection failures in a row.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, host='', failure_threshold=5, recovery_timeout=10.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Check if a request can be sent to the host.
+
+        Returns:
+            True if the request can be sent. When the circuit is open, only
+            one probe request is allowed every recovery_timeout seconds.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        """The host was reached (whatever the status code of the response)."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.host} is reachable again, resuming its requests")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def release_probe(self):
+        """A request ended without telling if the host is reachable (ex: aborted at the deadline).
+
+        A half-open circuit opens again, so the next probe is let through
+        after recovery_timeout seconds instead of never.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_failure(self):
+        """A connection to the host failed."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state == self.CLOSED:
+                    logger.warning(f"{self.host} is unreachable after {self.failures} connection failures, "
+                                   f"skipping its requests")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class HostCircuitBreakers(object):
+    """A CircuitBreaker for each host of a run.
+
+    Attributes:
+        failure_threshold: see CircuitBreaker.
+        recovery_timeout: see CircuitBreaker.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """Get the CircuitBreaker of the host of an URL."""
+        host = urlsplit(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    host, CircuitBreaker(host, self.failure_threshold, self.recovery_timeout))
+        return breaker
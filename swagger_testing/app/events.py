@@ -0,0 +1,96 @@
+import json
+import time
+
+from django.db import connection
+
+from app.models import TestRun, TestRunResult
+
+# Seconds between two checks for new results of a running run
+POLL_INTERVAL = 0.2
+# Seconds without event after which a comment is sent to keep the connection open
+KEEPALIVE_INTERVAL = 15
+# Maximum number of results read from the database at once
+BATCH_SIZE = 500
+# Seconds without new result or progress after which the stream ends (ex: a run queued with no worker)
+IDLE_TIMEOUT = 10 * 60
+# Maximum duration of a stream in seconds
+MAX_DURATION = 60 * 60
+
+
+def format_event(data, event=None, event_id=None):
+    """Format a server-sent event.
+
+    Args:
+        data: dict sent as JSON.
+        event: name of the event ('message' if None).
+        event_id: id of the event, sent back by the browser as Last-Event-ID
+                  when it reconnects.
+
+    Returns:
+        The event as bytes.
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def iter_run_events(run_id, last_id=0, poll_interval=POLL_INTERVAL, idle_timeout=IDLE_TIMEOUT,
+                    max_duration=MAX_DURATION):
+    """Stream the results of a run as server-sent events, as the worker stores them.
+
+    Only one batch of results is in memory at a time. Sends a 'result' event
+    per result, a 'progress' event when the counters of the run change and a
+    'done' event once the run is finished. The stream ends with a 'timeout'
+    event if the run does not progress for idle_timeout seconds, or after
+    max_duration seconds.
+
+    Args:
+        run_id: id of the TestRun.
+        last_id: id of the last result already received by the client.
+        poll_interval: number of seconds between two checks for new results.
+        idle_timeout: number of seconds without progress before the stream ends.
+        max_duration: maximum duration of the stream [in seconds].
+
+    Returns:
+        Yield each event as bytes.
+    """
+    progress = None
+    started_at = changed_at = sent_at = time.monotonic()
+    try:
+        while True:
+            # Read the run first: once it is finished, all its results are stored
+            run = TestRun.objects.only('status', 'total', 'completed', 'passed', 'failed', 'error').get(pk=run_id)
+            results = list(TestRunResult.objects.filter(run_id=run_id, pk__gt=last_id)
+                           .order_by('pk').values_list('pk', 'message', 'outcome')[:BATCH_SIZE])
+            for last_id, message, outcome in results:
+                yield format_event({'message': message, 'outcome': outcome, 'passed': outcome == TestRunResult.PASSED},
+                                   event='result', event_id=last_id)
+
+            if run.progress() != progress:
+                progress = run.progress()
+                yield format_event(progress, event='progress')
+                changed_at = sent_at = time.monotonic()
+            if results:
+                changed_at = sent_at = time.monotonic()
+                if len(results) == BATCH_SIZE:
+                    continue
+
+            if run.is_finished:
+                yield format_event(progress, event='done')
+                return
+            now = time.monotonic()
+            if now - changed_at >= idle_timeout or now - started_at >= max_duration:
+                yield format_event(dict(progress, message=f"The run is still {run.status}, reload the page to follow it"),
+                                   event='timeout')
+                return
+            if time.monotonic() - sent_at >= KEEPALIVE_INTERVAL:
+                yield b': keepalive\n\n'
+                sent_at = time.monotonic()
+            time.sleep(poll_interval)
+    finally:
+        # The stream may be read by a thread of its own, do not leave its connection open
+        connection.close()
@@ -2,3 +2,11 @@ from django import forms
 
 class URLProcessingForm(forms.Form):
     swagger_url = forms.URLField(label='Enter a URL', help_text='e.g. https://petstore.swagger.io/v2/swagger.json')
+    concurrency = forms.IntegerField(label='Concurrent requests', required=False, min_value=1, max_value=100,
+                                     help_text='Leave empty to run the tests one by one')
+    workers = forms.IntegerField(label='Parallel paths', required=False, min_value=1, max_value=64,
+                                 help_text='Test paths in parallel, keeping the order of operations of a path')
+    rate_limit = forms.FloatField(label='Requests per second', required=False, min_value=0.01,
+                                  help_text='Leave empty to send requests without limit')
+    deadline = forms.FloatField(label='Time limit (seconds)', required=False, min_value=1,
+                                help_text='Tests not sent in time are reported as timed out')
@@ -0,0 +1,247 @@
+from collections import namedtuple
+
+RequestTiming = namedtuple('RequestTiming', ['connect', 'ttfb', 'total', 'size'])
+RequestTiming.__doc__ = """Timing of a test request.
+
+Attributes:
+    connect: time spent opening a connection, 0 if a pooled one was reused [in seconds].
+    ttfb: time until the headers of the response were received [in seconds].
+    total: time until the whole response was received [in seconds].
+    size: size of the response body [in bytes].
+"""
+
+# Percentiles shown in the reports
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram(object):
+    """HDR-style histogram of durations.
+
+    Values are counted in microseconds, in buckets whose width grows with the
+    value: values under 2^significant_bits get a bucket each, and above, each
+    power of two is split in 2^(significant_bits - 1) buckets. The relative
+    error of a percentile stays under 1 / 2^(significant_bits - 1) (under 1%
+    by default), and only the buckets in use are stored, so the memory does
+    not grow with the number of values.
+
+    Attributes:
+        significant_bits: precision of the buckets.
+        counts: number of values of each bucket, by bucket index.
+        count: number of values.
+        total: sum of the values [in microseconds].
+        min: lowest value [in microseconds].
+        max: highest value [in microseconds].
+    """
+
+    __slots__ = ('significant_bits', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, significant_bits=8):
+        self.significant_bits = significant_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        """Count a duration given in seconds."""
+        value = max(int(round(seconds * 1000000)), 0)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Add the values of another histogram with the same significant_bits."""
+        if other.significant_bits != self.significant_bits:
+            raise ValueError('Cannot merge histograms of different precisions')
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Get a percentile of the values.
+
+        Args:
+            percent: percentile to get, between 0 and 100.
+
+        Returns:
+            The percentile in seconds, or None if the histogram is empty.
+        """
+        if not self.count:
+            return None
+        rank = max(percent / 100.0 * self.count, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                lowest, highest = self._bounds(index)
+                value = min(max((lowest + highest) / 2.0, self.min), self.max)
+                return value / 1000000.0
+        return self.max / 1000000.0
+
+    @property
+    def mean(self):
+        """Mean of the values in seconds, or None if the histogram is empty."""
+        if not self.count:
+            return None
+        return self.total / float(self.count) / 1000000.0
+
+    def to_dict(self):
+        """Get the histogram as a JSON serializable dict."""
+        return {
+            'significant_bits': self.significant_bits,
+            'counts': sorted(self.counts.items()),
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a histogram from the output of to_dict."""
+        histogram = cls(significant_bits=data['significant_bits'])
+        histogram.counts = {int(index): count for index, count in data['counts']}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+    def _index(self, value):
+        half = 1 << (self.significant_bits - 1)
+        if value < 2 * half:
+            return value
+        exponent = value.bit_length() - self.significant_bits
+        return exponent * half + (value >> exponent)
+
+    def _bounds(self, index):
+        half = 1 << (self.significant_bits - 1)
+        if index < 2 * half:
+            return index, index
+        exponent = index // half - 1
+        mantissa = index - exponent * half
+        return mantissa << exponent, ((mantissa + 1) << exponent) - 1
+
+
+class OperationLatency(object):
+    """Timing of the requests of one operation.
+
+    Attributes:
+        requests: number of requests timed.
+        size: total size of the responses [in bytes].
+        connect: LatencyHistogram of the connect times of the requests which opened a connection.
+        ttfb: LatencyHistogram of the times to first byte.
+        total: LatencyHistogram of the total times.
+    """
+
+    __slots__ = ('requests', 'size', 'connect', 'ttfb', 'total')
+
+    def __init__(self):
+        self.requests = 0
+        self.size = 0
+        self.connect = LatencyHistogram()
+        self.ttfb = LatencyHistogram()
+        self.total = LatencyHistogram()
+
+    def add(self, timing):
+        self.requests += 1
+        self.size += timing.size
+        if timing.connect:
+            self.connect.add(timing.connect)
+        self.ttfb.add(timing.ttfb)
+        self.total.add(timing.total)
+
+    def merge(self, other):
+        """Add the timings of another OperationLatency."""
+        self.requests += other.requests
+        self.size += other.size
+        self.connect.merge(other.connect)
+        self.ttfb.merge(other.ttfb)
+        self.total.merge(other.total)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'size': self.size,
+            'connect': self.connect.to_dict(),
+            'ttfb': self.ttfb.to_dict(),
+            'total': self.total.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        latency = cls()
+        latency.requests = data['requests']
+        latency.size = data['size']
+        latency.connect = LatencyHistogram.from_dict(data['connect'])
+        latency.ttfb = LatencyHistogram.from_dict(data['ttfb'])
+        latency.total = LatencyHistogram.from_dict(data['total'])
+        return latency
+
+    def summary(self):
+        """Get the percentiles of the operation, in milliseconds."""
+        summary = {'requests': self.requests, 'size': self.size}
+        for name in ('connect', 'ttfb', 'total'):
+            histogram = getattr(self, name)
+            summary[name] = {f"p{percent}": _milliseconds(histogram.percentile(percent))
+                             for percent in PERCENTILES}
+            summary[name]['mean'] = _milliseconds(histogram.mean)
+            summary[name]['max'] = _milliseconds(histogram.max / 1000000.0 if histogram.max is not None else None)
+        return summary
+
+
+class LatencyReport(object):
+    """Timing of the requests of a run, by operation id."""
+
+    __slots__ = ('operations',)
+
+    def __init__(self, operations=None):
+        self.operations = operations or {}
+
+    def add(self, operation, timing):
+        """Add the RequestTiming of a request of the given operation."""
+        latency = self.operations.get(operation)
+        if latency is None:
+            latency = self.operations[operation] = OperationLatency()
+        latency.add(timing)
+
+    def merge(self, other):
+        """Add the timings of another LatencyReport."""
+        for operation, other_latency in other.operations.items():
+            latency = self.operations.get(operation)
+            if latency is None:
+                latency = self.operations[operation] = OperationLatency()
+            latency.merge(other_latency)
+
+    def overall(self):
+        """Get the timings of all the operations together, as an OperationLatency."""
+        overall = OperationLatency()
+        for latency in self.operations.values():
+            overall.merge(latency)
+        return overall
+
+    def to_dict(self):
+        return {operation: latency.to_dict() for operation, latency in self.operations.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({operation: OperationLatency.from_dict(latency) for operation, latency in (data or {}).items()})
+
+    def summary(self):
+        """Get the percentiles of each operation, in milliseconds, sorted by operation."""
+        return [dict(operation=operation, **self.operations[operation].summary())
+                for operation in sorted(self.operations)]
+
+
+def _milliseconds(seconds):
+    if seconds is None:
+        return None
+    return round(seconds * 1000, 3)
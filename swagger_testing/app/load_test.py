@@ -0,0 +1,208 @@
+import itertools
+import random
+import threading
+import time
+
+from collections import Counter
+
+import requests
+
+from app.latency import PERCENTILES, LatencyReport
+from app.rate_limit import RateLimiter
+from app.utils import send_prepared_request
+
+# Methods sent in read only mode
+SAFE_METHODS = ('get', 'head', 'options')
+
+
+def load_requests(plan, read_only=False):
+    """Get the request replayed for each operation of a test plan.
+
+    An operation is replayed with its valid request, the one of its expected
+    status codes which is neither 400 (invalid body) nor 405 (wrong method).
+
+    Args:
+        plan: TestPlan of the specification.
+        read_only: only keep the operations with a safe method (GET, HEAD, OPTIONS).
+
+    Returns:
+        A dict of PreparedRequest by operation id.
+    """
+    operation_requests = {}
+    for test_request in plan:
+        if test_request.operation in operation_requests:
+            continue
+        if 400 in test_request.expected_status_codes or 405 in test_request.expected_status_codes:
+            continue
+        if read_only and test_request.method not in SAFE_METHODS:
+            continue
+        operation_requests[test_request.operation] = test_request
+    return operation_requests
+
+
+class LoadTestReport(object):
+    """Result of a load test.
+
+    Attributes:
+        users: number of virtual users.
+        duration: duration of the test [in seconds].
+        requests: number of requests sent.
+        errors: number of requests without response or answered with a status >= 400.
+        status_codes: Counter of the returned status codes (None for no response).
+        latency: LatencyReport of the requests, by operation id.
+        operation_errors: Counter of the errors by operation id.
+    """
+
+    __slots__ = ('users', 'duration', 'requests', 'errors', 'status_codes', 'latency', 'operation_errors')
+
+    def __init__(self, users=0):
+        self.users = users
+        self.duration = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.status_codes = Counter()
+        self.latency = LatencyReport()
+        self.operation_errors = Counter()
+
+    @property
+    def throughput(self):
+        """Requests per second."""
+        if self.duration <= 0:
+            return 0.0
+        return self.requests / self.duration
+
+    @property
+    def error_rate(self):
+        """Ratio of the requests which failed."""
+        if not self.requests:
+            return 0.0
+        return self.errors / float(self.requests)
+
+    def merge(self, other):
+        """Add the requests of another report, e.g. of another virtual user."""
+        self.requests += other.requests
+        self.errors += other.errors
+        self.status_codes.update(other.status_codes)
+        self.latency.merge(other.latency)
+        self.operation_errors.update(other.operation_errors)
+
+    def to_dict(self):
+        """Get the report as a JSON serializable dict, latencies in milliseconds."""
+        operations = self.latency.summary()
+        for operation in operations:
+            operation['errors'] = self.operation_errors.get(operation['operation'], 0)
+        overall = self.latency.overall().summary()
+        return {
+            'users': self.users,
+            'duration': round(self.duration, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'throughput': round(self.throughput, 3),
+            'error_rate': round(self.error_rate, 5),
+            'status_codes': {str(code): count for code, count in self.status_codes.items()},
+            'ttfb': overall['ttfb'],
+            'total': overall['total'],
+            'operations': operations,
+        }
+
+    def __str__(self):
+        report = self.to_dict()
+        lines = [
+            f"{self.requests} requests from {self.users} users in {self.duration:.2f}s: "
+            f"{self.throughput:.1f} requests/s, {self.errors} errors ({self.error_rate:.2%})",
+            "Total [ms]: " + ", ".join(f"p{percent} {report['total'][f'p{percent}']}" for percent in PERCENTILES),
+            "Status codes: " + ", ".join(f"{code}: {count}" for code, count in sorted(report['status_codes'].items())),
+        ]
+        for operation in report['operations']:
+            lines.append(f"  {operation['operation']}: {operation['requests']} requests, {operation['errors']} errors, "
+                         + ", ".join(f"p{percent} {operation['total'][f'p{percent}']}ms" for percent in PERCENTILES))
+        return '\n'.join(lines)
+
+
+def run_load_test(plan, session, users=10, duration=None, max_requests=None, weights=None, read_only=False,
+                  rate_limit=None, seed=None, timeouts=None, max_body_size=None):
+    """Replay the valid request of each operation of a test plan from concurrent virtual users.
+
+    Each virtual user is a thread sending one request after the other, picking
+    the operation of each request at random following the weights. The test
+    stops after duration seconds or max_requests requests, whichever comes first.
+
+    Args:
+        plan: TestPlan of the specification.
+        session: requests session shared by the users, with a pool of at least users connections.
+        users: number of virtual users.
+        duration: duration of the test [in seconds].
+        max_requests: number of requests to send.
+        weights: dict of the weight of operation ids. Operations missing from it
+                 weigh 1, operations with a weight of 0 are not sent.
+        read_only: only send the operations with a safe method (GET, HEAD, OPTIONS).
+        rate_limit: maximum number of requests per second of all the users together.
+        seed: seed of the operation picks, for a repeatable mix.
+        timeouts: RequestTimeouts of the requests (optional), a timed out request is an error.
+        max_body_size: maximum number of bytes read from each response body (optional),
+                       bounding the memory used by each user.
+
+    Returns:
+        A LoadTestReport.
+
+    Raises:
+        ValueError: if neither duration nor max_requests is given, or no operation can be sent.
+    """
+    if duration is None and max_requests is None:
+        raise ValueError('A duration or a number of requests is required')
+    weights = weights or {}
+    operation_requests = load_requests(plan, read_only=read_only)
+    mix = [(operation_requests[operation], weights.get(operation, 1)) for operation in sorted(operation_requests)]
+    mix = [(test_request, weight) for test_request, weight in mix if weight > 0]
+    if not mix:
+        raise ValueError('No operation to send')
+    mix_requests = [test_request for test_request, _ in mix]
+    cum_weights = list(itertools.accumulate(weight for _, weight in mix))
+
+    rate_limiter = RateLimiter(rate_limit, burst=users) if rate_limit else None
+    budget = itertools.count() if max_requests is not None else None
+    budget_lock = threading.Lock()
+    user_reports = [LoadTestReport() for _ in range(users)]
+    seeds = random.Random(seed)
+    user_seeds = [seeds.random() for _ in range(users)]
+
+    def run_user(report, user_seed):
+        rng = random.Random(user_seed)
+        while deadline is None or time.monotonic() < deadline:
+            if budget is not None:
+                with budget_lock:
+                    if next(budget) >= max_requests:
+                        return
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            test_request = rng.choices(mix_requests, cum_weights=cum_weights)[0]
+            report.requests += 1
+            try:
+                response, timing = send_prepared_request(
+                    session, test_request, timeout=timeouts.get(test_request.operation) if timeouts else None,
+                    max_body_size=max_body_size)
+            except requests.exceptions.RequestException:
+                report.errors += 1
+                report.status_codes[None] += 1
+                report.operation_errors[test_request.operation] += 1
+                continue
+            report.status_codes[response.status_code] += 1
+            report.latency.add(test_request.operation, timing)
+            if response.status_code >= 400:
+                report.errors += 1
+                report.operation_errors[test_request.operation] += 1
+
+    start = time.monotonic()
+    deadline = start + duration if duration is not None else None
+    threads = [threading.Thread(target=run_user, args=(user_reports[i], user_seeds[i]), daemon=True)
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = LoadTestReport(users=users)
+    report.duration = time.monotonic() - start
+    for user_report in user_reports:
+        report.merge(user_report)
+    return report
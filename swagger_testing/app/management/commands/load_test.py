@@ -0,0 +1,59 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.load_test import run_load_test
+from app.utils import SwaggerLoadError, build_runner_session, get_request_timeouts, load_test_plan
+
+
+class Command(BaseCommand):
+    help = 'Load test an api with the requests built from the examples of its swagger specification.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('swagger_url', help='URL of the swagger specification.')
+        parser.add_argument('--users', type=int, default=10, help='Number of concurrent virtual users.')
+        parser.add_argument('--duration', type=float, help='Duration of the test in seconds.')
+        parser.add_argument('--requests', type=int, dest='max_requests', help='Number of requests to send.')
+        parser.add_argument('--weight', action='append', default=[], metavar='OPERATION=WEIGHT',
+                            help='Weight of an operation in the mix (1 by default, 0 to skip it). Repeatable.')
+        parser.add_argument('--read-only', action='store_true',
+                            help='Only send the GET, HEAD and OPTIONS operations.')
+        parser.add_argument('--rate', type=float, help='Maximum number of requests per second.')
+        parser.add_argument('--seed', type=int, help='Seed of the operation mix.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        if options['duration'] is None and options['max_requests'] is None:
+            raise CommandError('Give a --duration or a number of --requests.')
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1.')
+        weights = {}
+        for weight in options['weight']:
+            operation, _, value = weight.rpartition('=')
+            try:
+                weights[operation] = float(value)
+            except ValueError:
+                raise CommandError(f"Invalid weight: {weight}")
+
+        session = build_runner_session(options['users'])
+        try:
+            try:
+                plan = load_test_plan(options['swagger_url'], session=session)
+            except SwaggerLoadError as exc:
+                raise CommandError(str(exc))
+            try:
+                report = run_load_test(plan, session, users=options['users'], duration=options['duration'],
+                                       max_requests=options['max_requests'], weights=weights,
+                                       read_only=options['read_only'], rate_limit=options['rate'],
+                                       seed=options['seed'], timeouts=get_request_timeouts(),
+                                       max_body_size=getattr(settings, 'SWAGGER_TEST_MAX_BODY_SIZE', None))
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        finally:
+            session.close()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report.to_dict(), indent=2))
+        else:
+            self.stdout.write(str(report))
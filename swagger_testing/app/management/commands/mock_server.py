@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import signal
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.mock_server import MockApi, run_mock_server
+from app.swagger_parser import SwaggerParser
+from app.utils import SwaggerLoadError, load_swagger
+
+
+def serve_process(api, host, port, index):
+    """Serve the mock api in one of several processes sharing the port."""
+    api.reseed(index)
+    run_mock_server(api, host, port, reuse_port=True)
+
+
+class Command(BaseCommand):
+    help = 'Serve a mock of an api answering the examples of its swagger specification.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('swagger', help='URL or file of the swagger specification.')
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on.')
+        parser.add_argument('--port', type=int, default=8000, help='Port to listen on.')
+        parser.add_argument('--validate', action='store_true',
+                            help='Answer 400 to the requests whose body or query do not match the specification.')
+        parser.add_argument('--latency', type=float, default=0.0, metavar='MS',
+                            help='Latency added to every response, in milliseconds.')
+        parser.add_argument('--jitter', type=float, default=0.0, metavar='MS',
+                            help='Maximum random latency added on top of --latency, in milliseconds.')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of the requests answered with an error (0 to 1).')
+        parser.add_argument('--error-status', type=int, default=500, help='Status code of the injected errors.')
+        parser.add_argument('--seed', type=int, help='Seed of the injected latency and errors.')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of processes sharing the port (needs SO_REUSEPORT).')
+
+    def handle(self, *args, **options):
+        if os.path.exists(options['swagger']):
+            try:
+                swagger_parser = SwaggerParser(swagger_path=options['swagger'], use_example=True, lazy=True)
+            except ValueError as exc:
+                raise CommandError(f"Invalid swagger: {exc}")
+        else:
+            try:
+                swagger_parser, _ = load_swagger(options['swagger'])
+            except SwaggerLoadError as exc:
+                raise CommandError(str(exc))
+
+        try:
+            api = MockApi(swagger_parser, validate=options['validate'], latency=options['latency'] / 1000,
+                          jitter=options['jitter'] / 1000, error_rate=options['error_rate'],
+                          error_status=options['error_status'], seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f"Serving {len(api.responses)} operations on http://{options['host']}:{options['port']}")
+        processes = max(options['processes'], 1)
+        if processes == 1:
+            run_mock_server(api, options['host'], options['port'])
+            return
+
+        servers = [multiprocessing.Process(target=serve_process, args=(api, options['host'], options['port'], index))
+                   for index in range(processes)]
+        for server in servers:
+            server.start()
+        # Stop the servers with this process, the servers are interrupted with it on Ctrl+C
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            for server in servers:
+                server.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for server in servers:
+                if server.is_alive():
+                    server.terminate()
+                server.join()
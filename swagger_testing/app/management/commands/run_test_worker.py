@@ -0,0 +1,33 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.worker import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Execute the test runs submitted through the web view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of worker processes executing runs in parallel.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between two checks of an empty queue.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        kwargs = {'poll_interval': options['poll_interval'], 'once': options['once']}
+        if processes == 1:
+            run_worker(**kwargs)
+            return
+
+        # Each process opens its own database connections
+        connections.close_all()
+        workers = [multiprocessing.Process(target=run_worker, kwargs=kwargs) for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
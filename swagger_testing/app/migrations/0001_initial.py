@@ -0,0 +1,49 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('swagger_url', models.URLField(max_length=2000)),
+                ('concurrency', models.PositiveIntegerField(blank=True, null=True)),
+                ('workers', models.PositiveIntegerField(blank=True, null=True)),
+                ('rate_limit', models.FloatField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=16)),
+                ('total', models.PositiveIntegerField(default=0, help_text='Number of operations to test')),
+                ('completed', models.PositiveIntegerField(default=0, help_text='Number of operations tested')),
+                ('passed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TestRunResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('passed', models.BooleanField()),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='app.testrun')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
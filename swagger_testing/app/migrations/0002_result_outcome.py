@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+
+def set_outcome(apps, schema_editor):
+    TestRunResult = apps.get_model('app', 'TestRunResult')
+    TestRunResult.objects.filter(passed=False).update(outcome='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrunresult',
+            name='operation',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='testrunresult',
+            name='outcome',
+            field=models.CharField(choices=[('passed', 'Passed'), ('failed', 'Failed'), ('error', 'Error')], default='passed', max_length=8),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='testrunresult',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_outcome, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='testrunresult',
+            name='passed',
+        ),
+        migrations.AddIndex(
+            model_name='testrunresult',
+            index=models.Index(fields=['run', 'operation'], name='app_testrun_run_id_d1cd94_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testrunresult',
+            index=models.Index(fields=['run', 'outcome'], name='app_testrun_run_id_b77b9b_idx'),
+        ),
+    ]
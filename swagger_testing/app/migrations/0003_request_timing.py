@@ -0,0 +1,38 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_result_outcome'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrun',
+            name='latency',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='testrunresult',
+            name='connect_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testrunresult',
+            name='response_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testrunresult',
+            name='total_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testrunresult',
+            name='ttfb',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_request_timing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrun',
+            name='deadline',
+            field=models.FloatField(blank=True, help_text='Maximum duration of the run in seconds, SWAGGER_TEST_RUN_DEADLINE if empty', null=True),
+        ),
+        migrations.AlterField(
+            model_name='testrun',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_index=True, default='queued', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='testrunresult',
+            name='outcome',
+            field=models.CharField(choices=[('passed', 'Passed'), ('failed', 'Failed'), ('error', 'Error'), ('timeout', 'Timeout')], max_length=8),
+        ),
+    ]
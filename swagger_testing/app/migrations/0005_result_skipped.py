@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_run_deadline'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='testrunresult',
+            name='outcome',
+            field=models.CharField(choices=[('passed', 'Passed'), ('failed', 'Failed'), ('error', 'Error'), ('timeout', 'Timeout'), ('skipped', 'Skipped')], max_length=8),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_result_skipped'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrun',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging
+import random
+
+from collections import Counter, deque
+from http import HTTPStatus
+
+try:
+    from urlparse import parse_qs, unquote
+except ImportError:  # Python 3
+    from urllib.parse import parse_qs, unquote
+
+logger = logging.getLogger(__name__)
+
+# Limits of a request, larger requests are answered with an error and the connection closed
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+
+def build_response(status_code, body=b'', content_type='application/json', headers=()):
+    """Encode a complete HTTP/1.1 response.
+
+    Args:
+        status_code: status code of the response.
+        body: body of the response (bytes).
+        content_type: content type of the body.
+        headers: additional (name, value) headers.
+
+    Returns:
+        The response as bytes, ready to be written on a connection.
+    """
+    try:
+        reason = HTTPStatus(status_code).phrase
+    except ValueError:
+        reason = 'Unknown'
+    lines = [f"HTTP/1.1 {status_code} {reason}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def _json_response(status_code, data, headers=()):
+    return build_response(status_code, json.dumps(data).encode('utf-8'), headers=headers)
+
+
+class MockApi(object):
+    """Answer the requests of an api described by a swagger specification.
+
+    The response of each operation is built once from the examples of the
+    specification and kept encoded, so answering a request only parses its
+    path and writes bytes: the mock can sustain far more requests than the
+    runner sends.
+
+    Attributes:
+        swagger_parser: SwaggerParser of the specification.
+        validate: check the body and query of the requests with validate_request,
+                  and answer 400 to the invalid ones.
+        latency: latency added to every response [in seconds].
+        jitter: maximum random latency added on top of latency [in seconds].
+        error_rate: fraction of the requests answered with error_status.
+        error_status: status code of the injected errors.
+        responses: encoded response by (path name, action).
+        counts: number of responses sent by status code.
+    """
+
+    ROUTE_CACHE_SIZE = 10000
+
+    def __init__(self, swagger_parser, validate=False, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=500, seed=None):
+        if not 0 <= error_rate <= 1:
+            raise ValueError(f"The error rate must be between 0 and 1, not {error_rate}")
+        if latency < 0 or jitter < 0:
+            raise ValueError("The latency and jitter cannot be negative")
+        self.swagger_parser = swagger_parser
+        self.validate = validate
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+        self.responses = {}
+        self._status_codes = {}
+        self._allowed = {}
+        self._route_cache = {}
+
+        for path_name, path_spec in swagger_parser.paths.items():
+            actions = [action for action in path_spec.keys() if action in swagger_parser._HTTP_VERBS]
+            self._allowed[path_name] = ', '.join(action.upper() for action in actions)
+            for action in actions:
+                self._status_codes[(path_name, action)], self.responses[(path_name, action)] = \
+                    self._operation_response(path_name, action)
+
+        self.not_found = _json_response(404, {'message': 'No path of the specification matches'})
+        self.invalid = _json_response(400, {'message': 'The request does not match the specification'})
+        self.error = _json_response(error_status, {'message': 'Injected error'})
+
+    def reseed(self, offset):
+        """Give a distinct random sequence to a copy of the mock (ex: in another process)."""
+        self.rng = random.Random(None if self.seed is None else self.seed + offset)
+
+    def _operation_response(self, path_name, action):
+        """Encode the example response of an operation.
+
+        The first success status code of the operation is answered, or its
+        default response with a 200.
+
+        Returns:
+            A tuple with the status code and the encoded response.
+        """
+        responses = self.swagger_parser.paths[path_name][action]['responses']
+        status_codes = sorted(int(status_code) for status_code in responses.keys() if str(status_code).isdigit())
+        success_codes = [status_code for status_code in status_codes if 200 <= status_code < 300]
+        if success_codes:
+            status_code = success_codes[0]
+            resp_spec = responses.get(status_code, responses.get(str(status_code)))
+        elif 'default' in responses:
+            status_code, resp_spec = 200, responses['default']
+        elif status_codes:
+            status_code = status_codes[0]
+            resp_spec = responses.get(status_code, responses.get(str(status_code)))
+        else:
+            return 200, build_response(200)
+
+        try:
+            example = self.swagger_parser.get_response_example(resp_spec or {})
+            if isinstance(example, tuple) and hasattr(example[0], 'getvalue'):
+                # A file (ex: (StringIO, file name)) is sent as is, with the type the operation produces
+                content = example[0].getvalue()
+                body = content.encode('utf-8') if isinstance(content, str) else content
+                produces = (self.swagger_parser.paths[path_name][action].get('produces') or
+                            self.swagger_parser.specification.get('produces') or ['application/octet-stream'])
+                content_type = produces[0]
+            else:
+                body = b'' if example == '' else json.dumps(example).encode('utf-8')
+                content_type = 'application/json'
+        except Exception as exc:
+            logger.warning(f"No example response for {action.upper()} {path_name}: {exc!r}")
+            body = b''
+        if not body or action == 'head':
+            return status_code, build_response(status_code)
+        return status_code, build_response(status_code, body, content_type=content_type)
+
+    def route(self, path):
+        """Get the path name of the specification matching a request path (or None)."""
+        try:
+            return self._route_cache[path]
+        except KeyError:
+            pass
+        path_name, _ = self.swagger_parser.router.match(unquote(path))
+        if len(self._route_cache) >= self.ROUTE_CACHE_SIZE:
+            self._route_cache.clear()
+        self._route_cache[path] = path_name
+        return path_name
+
+    def delay(self):
+        """Get the latency to add to a response [in seconds]."""
+        if self.jitter:
+            return self.latency + self.rng.random() * self.jitter
+        return self.latency
+
+    def respond(self, method, target, body=b'', content_type=''):
+        """Get the response to a request.
+
+        Args:
+            method: method of the request (ex: 'GET').
+            target: path and query of the request (ex: '/v2/pet/42?verbose=1').
+            body: body of the request (bytes).
+            content_type: content type of the body.
+
+        Returns:
+            The encoded response.
+        """
+        path, _, query = target.partition('?')
+        action = method.lower()
+        path_name = self.route(path)
+        if path_name is None:
+            response, status_code = self.not_found, 404
+        elif (path_name, action) not in self.responses:
+            response = _json_response(405, {'message': f"{method} is not allowed on {path_name}"},
+                                      headers=(('Allow', self._allowed[path_name]),))
+            status_code = 405
+        elif self.error_rate and self.rng.random() < self.error_rate:
+            response, status_code = self.error, self.error_status
+        elif self.validate and not self._is_valid(path_name, path, action, query, body, content_type):
+            response, status_code = self.invalid, 400
+        else:
+            response, status_code = self.responses[(path_name, action)], self._status_codes[(path_name, action)]
+        self.counts[status_code] += 1
+        return response
+
+    def _is_valid(self, path_name, path, action, query, body, content_type):
+        """Check a request with the validate_request of the parser."""
+        parameters = self.swagger_parser.paths[path_name][action]['parameters']
+        query_values = {}
+        for name, values in parse_qs(query, keep_blank_values=True).items():
+            if parameters.get(name, {}).get('type') == 'array':
+                query_values[name] = values if len(values) > 1 else values[0].split(',')
+            else:
+                query_values[name] = values[-1]
+
+        body = body.decode('utf-8', 'replace')
+        if body and 'json' in content_type:
+            try:
+                body = json.loads(body)
+            except ValueError:
+                return False
+        try:
+            return self.swagger_parser.validate_request(unquote(path), action, body=body or None,
+                                                        query=query_values or None)
+        except Exception:  # The parser does not expect every malformed request
+            return False
+
+
+class MockHTTPProtocol(asyncio.Protocol):
+    """Minimal HTTP/1.1 server of a MockApi, with keep-alive and pipelining.
+
+    The responses of a connection are written in the order of its requests,
+    even with an injected latency: a delayed response waits in a queue, and
+    the responses after it wait for it even if their own delay is shorter.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.loop = asyncio.get_event_loop()
+        self.transport = None
+        self.buffer = bytearray()
+        self.closing = False
+        # (ready_at, response, keep_alive) of the responses waiting to be written, in the order of the requests
+        self.pending = deque()
+        self._flush_handle = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.closing = True
+        self.pending.clear()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    def data_received(self, data):
+        if self.closing:
+            return
+        self.buffer += data
+        while not self.closing:
+            header_end = self.buffer.find(b'\r\n\r\n')
+            if header_end < 0:
+                if len(self.buffer) > MAX_HEADER_SIZE:
+                    self._send(build_response(431), keep_alive=False)
+                return
+
+            lines = bytes(self.buffer[:header_end]).decode('latin-1').split('\r\n')
+            try:
+                method, target, version = lines[0].split(' ', 2)
+            except ValueError:
+                self._send(build_response(400), keep_alive=False)
+                return
+            keep_alive = version == 'HTTP/1.1'
+            content_length = 0
+            content_type = ''
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                name = name.strip().lower()
+                if name == 'content-length':
+                    try:
+                        content_length = int(value)
+                    except ValueError:
+                        self._send(build_response(400), keep_alive=False)
+                        return
+                elif name == 'content-type':
+                    content_type = value.strip().lower()
+                elif name == 'connection':
+                    value = value.strip().lower()
+                    if value == 'close':
+                        keep_alive = False
+                    elif value == 'keep-alive':
+                        keep_alive = True
+                elif name == 'transfer-encoding' and 'chunked' in value.lower():
+                    self._send(build_response(411), keep_alive=False)
+                    return
+
+            if content_length > MAX_BODY_SIZE:
+                self._send(build_response(413), keep_alive=False)
+                return
+            request_end = header_end + 4 + content_length
+            if len(self.buffer) < request_end:  # Wait for the rest of the body
+                return
+            body = bytes(self.buffer[header_end + 4:request_end])
+            del self.buffer[:request_end]
+
+            self._send(self.api.respond(method, target, body, content_type), keep_alive,
+                       delay=self.api.delay())
+
+    def _send(self, response, keep_alive, delay=0.0):
+        """Write a response now or after the given delay, after the previous responses."""
+        if not keep_alive:
+            self.closing = True
+        if not delay and not self.pending:
+            self._write(response, keep_alive)
+            return
+        self.pending.append((self.loop.time() + delay, response, keep_alive))
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_at(self.pending[0][0], self._flush)
+
+    def _flush(self):
+        """Write the responses at the head of the queue which are ready, then wait for the next one."""
+        self._flush_handle = None
+        now = self.loop.time()
+        while self.pending and self.pending[0][0] <= now:
+            _, response, keep_alive = self.pending.popleft()
+            self._write(response, keep_alive)
+        if self.pending:
+            self._flush_handle = self.loop.call_at(self.pending[0][0], self._flush)
+
+    def _write(self, response, keep_alive):
+        if self.transport.is_closing():
+            self.pending.clear()
+            return
+        self.transport.write(response)
+        if not keep_alive:
+            self.transport.close()
+
+
+async def serve_mock_api(api, host='127.0.0.1', port=8000, reuse_port=False):
+    """Serve a MockApi until cancelled.
+
+    Args:
+        api: MockApi to serve.
+        host: address to listen on.
+        port: port to listen on.
+        reuse_port: share the port with other processes serving the same api.
+    """
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: MockHTTPProtocol(api), host, port,
+                                      reuse_port=reuse_port or None, backlog=2048)
+    async with server:
+        await server.serve_forever()
+
+
+def run_mock_server(api, host='127.0.0.1', port=8000, reuse_port=False):
+    """Serve a MockApi in its own event loop, until interrupted.
+
+    uvloop is used when it is installed.
+
+    Args:
+        api: MockApi to serve.
+        host: address to listen on.
+        port: port to listen on.
+        reuse_port: share the port with other processes serving the same api.
+    """
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    try:
+        asyncio.run(serve_mock_api(api, host, port, reuse_port=reuse_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        counts = ', '.join(f"{count} {status_code}" for status_code, count in sorted(api.counts.items()))
+        logger.info(f"Mock server on {host}:{port} answered {sum(api.counts.values())} requests ({counts})")
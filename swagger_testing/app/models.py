@@ -0,0 +1,107 @@
+from django.db import models
+
+
+class TestRun(models.Model):
+    """A test run of a swagger specification, executed by a test worker."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+    swagger_url = models.URLField(max_length=2000)
+    concurrency = models.PositiveIntegerField(null=True, blank=True)
+    workers = models.PositiveIntegerField(null=True, blank=True)
+    rate_limit = models.FloatField(null=True, blank=True)
+    deadline = models.FloatField(null=True, blank=True,
+                                 help_text='Maximum duration of the run in seconds, SWAGGER_TEST_RUN_DEADLINE if empty')
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    total = models.PositiveIntegerField(default=0, help_text='Number of operations to test')
+    completed = models.PositiveIntegerField(default=0, help_text='Number of operations tested')
+    passed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # LatencyReport of the run, see app.latency
+    latency = models.JSONField(default=dict, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker executing the run, a running run not refreshed for
+    # SWAGGER_WORKER_STALE_AFTER seconds is queued again
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.swagger_url} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    def progress(self):
+        """Get the progress of the run as a dict, for the status endpoint."""
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'total': self.total,
+            'completed': self.completed,
+            'passed': self.passed,
+            'failed': self.failed,
+            'error': self.error,
+        }
+
+
+class TestRunResult(models.Model):
+    """Result of one test of a TestRun."""
+
+    PASSED = 'passed'
+    FAILED = 'failed'
+    ERROR = 'error'
+    TIMEOUT = 'timeout'
+    SKIPPED = 'skipped'
+    OUTCOME_CHOICES = [
+        (PASSED, 'Passed'),
+        (FAILED, 'Failed'),
+        (ERROR, 'Error'),
+        (TIMEOUT, 'Timeout'),
+        (SKIPPED, 'Skipped'),
+    ]
+
+    run = models.ForeignKey(TestRun, on_delete=models.CASCADE, related_name='results')
+    operation = models.CharField(max_length=255, blank=True)
+    outcome = models.CharField(max_length=8, choices=OUTCOME_CHOICES)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    message = models.TextField()
+
+    # Timing of the request [in seconds], null if there was no response
+    connect_time = models.FloatField(null=True, blank=True)
+    ttfb = models.FloatField(null=True, blank=True)
+    total_time = models.FloatField(null=True, blank=True)
+    response_size = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['run', 'operation']),
+            models.Index(fields=['run', 'outcome']),
+        ]
+
+    def __str__(self):
+        return self.message
+
+    @property
+    def passed(self):
+        return self.outcome == self.PASSED
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import zlib
+
+from app.swagger_parser import SwaggerParser
+
+logger = logging.getLogger(__name__)
+
+# Bump when the state or the output of SwaggerParser changes (parsing, examples,
+# validation), so older entries are not loaded. The test plans are keyed with it
+# too, as they are built from the parser output.
+CACHE_VERSION = 4
+
+_CACHE_SUFFIX = '.parser'
+
+
+def spec_hash(content, **options):
+    """Get the SHA-256 key of a swagger specification and parser options.
+
+    Args:
+        content: raw content of the specification (bytes or str), or the spec dict.
+        options: options given to SwaggerParser (use_example, lazy...).
+
+    Returns:
+        The hex digest of the spec and options.
+    """
+    if isinstance(content, dict):
+        content = json.dumps(content, sort_keys=True)
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+
+    h = hashlib.sha256()
+    h.update(content)
+    h.update(("|{0}|{1}".format(CACHE_VERSION, sorted(options.items()))).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ParseCache(object):
+    """On-disk cache of parsed SwaggerParser instances.
+
+    Each entry is the zlib compressed pickle of a parser, stored in a file
+    named after the hash of its specification. The least recently used
+    entries are removed once the cache grows over max_size.
+
+    Attributes:
+        cache_dir: directory of the cache files.
+        max_size: maximum size of the cache in bytes.
+    """
+
+    def __init__(self, cache_dir, max_size=256 * 1024 * 1024):
+        self.cache_dir = str(cache_dir)
+        self.max_size = max_size
+
+    def get_or_parse(self, content, swagger_dict=None, **options):
+        """Get the parser of the given specification, parsing it on a miss.
+
+        Args:
+            content: raw content of the specification (bytes or str), or the spec dict.
+            swagger_dict: already decoded specification, decoded from content if None.
+            options: options given to SwaggerParser (use_example, lazy...).
+
+        Returns:
+            A SwaggerParser.
+
+        Raises:
+            - ValueError: if the content is not JSON or not a valid swagger.
+        """
+        key = spec_hash(content, **options)
+        swagger_parser = self.get(key)
+        if swagger_parser is None:
+            if swagger_dict is None:
+                swagger_dict = content if isinstance(content, dict) else json.loads(content)
+            swagger_parser = SwaggerParser(swagger_dict=swagger_dict, **options)
+            self.set(key, swagger_parser)
+        return swagger_parser
+
+    def get(self, key):
+        """Load the parser stored for the given key.
+
+        Args:
+            key: key of the entry, see spec_hash.
+
+        Returns:
+            The SwaggerParser, or None if the key is not in the cache.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                swagger_parser = pickle.loads(zlib.decompress(cache_file.read()))
+        except (IOError, OSError):
+            return None
+        except Exception as exc:  # Corrupted or outdated entry
+            logger.warning(f"Cannot load parse cache entry {key}: {repr(exc)}")
+            self._remove(path)
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return swagger_parser
+
+    def set(self, key, swagger_parser):
+        """Store the parser for the given key and evict old entries if needed.
+
+        Args:
+            key: key of the entry, see spec_hash.
+            swagger_parser: SwaggerParser to store.
+        """
+        try:
+            data = zlib.compress(pickle.dumps(swagger_parser, pickle.HIGHEST_PROTOCOL))
+        except Exception as exc:
+            logger.warning(f"Cannot serialize parser for the parse cache: {repr(exc)}")
+            return
+        if len(data) > self.max_size:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as exc:
+            logger.warning(f"Cannot write parse cache entry {key}: {repr(exc)}")
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_size."""
+        entries = []
+        total_size = 0
+        try:
+            file_names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for file_name in file_names:
+            if not file_name.endswith(_CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+    def clear(self):
+        """Remove every entry of the cache."""
+        try:
+            file_names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for file_name in file_names:
+            if file_name.endswith(_CACHE_SUFFIX):
+                self._remove(os.path.join(self.cache_dir, file_name))
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + _CACHE_SUFFIX)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,122 @@
+import datetime
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+
+# Status codes telling the client to slow down
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value):
+    """Get the number of seconds to wait from a Retry-After header.
+
+    Args:
+        value: value of the header, a number of seconds or an HTTP date.
+
+    Returns:
+        The number of seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+class RateLimiter(object):
+    """Token bucket limiting the rate of the test requests.
+
+    Tokens are added at the current rate up to burst, and each request takes
+    one. When the server pushes back (429/503), the rate is halved and
+    requests are paused for the Retry-After delay; each successful request
+    then adds back a tenth of the target rate until it is reached again.
+    Thread safe, so it can be shared by the workers of a run.
+
+    Attributes:
+        target_rate: requests per second to reach.
+        rate: current requests per second.
+        burst: maximum number of requests sent at once.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None):
+        """
+        Args:
+            rate: target number of requests per second.
+            burst: maximum number of requests sent at once.
+            min_rate: lowest rate reached when backing off (rate / 64 if None).
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.target_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(burst, 1)
+        self.min_rate = min_rate or self.target_rate / 64
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request can be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, retry_after=None):
+        """Slow down after the server asked to.
+
+        Args:
+            retry_after: number of seconds to pause, from the Retry-After header.
+                         Pause for one request interval if None.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.rate / 2, self.min_rate)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._paused_until = max(self._paused_until, now + pause)
+            self._tokens = 0.0
+
+    def success(self):
+        """Ramp the rate back up after a request which was not throttled."""
+        if self.rate >= self.target_rate:
+            return
+        with self._lock:
+            self.rate = min(self.rate + self.target_rate / 10, self.target_rate)
+
+    def observe(self, response):
+        """Update the rate from the response of a request.
+
+        Args:
+            response: requests response.
+
+        Returns:
+            True if the server throttled the request.
+        """
+        if response.status_code in THROTTLE_STATUS_CODES:
+            self.backoff(parse_retry_after(response.headers.get('Retry-After')))
+            return True
+        self.success()
+        return False
+
+    def _refill(self, now):
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+        self._updated = now
@@ -0,0 +1,74 @@
+import time
+
+from django.db.models import F
+
+from app.latency import LatencyReport
+from app.models import TestRun, TestRunResult
+
+# Results are written by batch, at least every FLUSH_INTERVAL seconds
+FLUSH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+
+class RunRecorder(object):
+    """Store the results of a run by batch and keep its progress up to date."""
+
+    def __init__(self, run):
+        self.run = run
+        self.pending = []
+        self.completed = 0
+        self.passed = 0
+        self.failed = 0
+        # Number of results received for each operation
+        self.operation_results = {}
+        # Store the first result at once, so it is streamed without waiting
+        self.flushed_at = 0.0
+        self.latency = LatencyReport()
+
+    def add(self, result):
+        """Add a TestResult to the run, writing the pending ones if needed."""
+        test_request = result.test_request
+        operation = test_request.operation if test_request is not None else ''
+        run_result = TestRunResult(run_id=self.run.pk, operation=operation[:255], outcome=result.outcome,
+                                   status_code=result.status_code, message=str(result))
+        timing = result.timing
+        if timing is not None:
+            run_result.connect_time = timing.connect
+            run_result.ttfb = timing.ttfb
+            run_result.total_time = timing.total
+            run_result.response_size = timing.size
+            # The results of the expected status codes of a request share its timing
+            if result.expected_status_code == test_request.expected_status_codes[0]:
+                self.latency.add(operation, timing)
+        self.pending.append(run_result)
+        if result.passed:
+            self.passed += 1
+        else:
+            self.failed += 1
+
+        if test_request is not None:
+            count = self.operation_results.get(operation, 0) + 1
+            if count == test_request.operation_tests:
+                self.operation_results.pop(operation, None)
+                self.completed += 1
+            else:
+                self.operation_results[operation] = count
+
+        if len(self.pending) >= FLUSH_SIZE or time.monotonic() - self.flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write the pending results and the progress of the run."""
+        TestRunResult.objects.bulk_create(self.pending, batch_size=FLUSH_SIZE)
+        TestRun.objects.filter(pk=self.run.pk).update(
+            completed=F('completed') + self.completed,
+            passed=F('passed') + self.passed,
+            failed=F('failed') + self.failed)
+        self.pending = []
+        self.completed = self.passed = self.failed = 0
+        self.flushed_at = time.monotonic()
+
+    def close(self):
+        """Write the pending results and the latency report of the run."""
+        self.flush()
+        TestRun.objects.filter(pk=self.run.pk).update(latency=self.latency.to_dict())
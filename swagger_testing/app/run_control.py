@@ -0,0 +1,113 @@
+import threading
+import time
+
+from app.sessions import abort_requests
+
+# Shortest timeout given to a request close to the deadline [in seconds]
+MIN_TIMEOUT = 0.001
+
+
+class RequestTimeouts(object):
+    """Connect and read timeouts of the test requests, overridable by operation.
+
+    The read timeout is the longest wait for a byte of the response, not
+    the duration of the whole response.
+
+    Attributes:
+        connect: default connect timeout [in seconds], None to wait forever.
+        read: default read timeout [in seconds], None to wait forever.
+        operations: dict of (connect, read) timeouts by operation id.
+    """
+
+    def __init__(self, connect=None, read=None, operations=None):
+        self.connect = connect
+        self.read = read
+        self.operations = {}
+        for operation, timeout in (operations or {}).items():
+            # A single number only overrides the read timeout
+            if isinstance(timeout, (tuple, list)):
+                self.operations[operation] = tuple(timeout)
+            else:
+                self.operations[operation] = (connect, timeout)
+
+    def get(self, operation):
+        """Get the (connect, read) timeouts of an operation."""
+        return self.operations.get(operation, (self.connect, self.read))
+
+
+class RunControl(object):
+    """Deadline and cancellation of a run.
+
+    It is shared by the threads sending the requests of the run: the
+    timeouts of a request are cut to the time left before the deadline, and
+    the requests in flight are aborted when the deadline passes or the run
+    is cancelled, so a slow endpoint cannot delay the end of the run.
+
+    Attributes:
+        session: requests session of the run, built by build_session.
+        deadline: maximum duration of the run [in seconds], None for no limit.
+    """
+
+    def __init__(self, session, deadline=None):
+        self.session = session
+        self.deadline = deadline
+        self.deadline_at = time.monotonic() + deadline if deadline else None
+        self._cancelled = threading.Event()
+        self._expired = threading.Event()
+        self._closed = threading.Event()
+        self._timer = None
+        if deadline:
+            self._timer = threading.Timer(deadline, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self):
+        """True once the deadline has passed."""
+        return self._expired.is_set() or (self.deadline_at is not None and time.monotonic() >= self.deadline_at)
+
+    @property
+    def stopped(self):
+        """True if no more requests should be sent."""
+        return self.cancelled or self.expired
+
+    def remaining(self):
+        """Get the time left before the deadline [in seconds], None for no limit."""
+        if self.deadline_at is None:
+            return None
+        return max(self.deadline_at - time.monotonic(), 0.0)
+
+    def timeout(self, timeout=(None, None)):
+        """Cut the (connect, read) timeouts of a request to the time left before the deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        remaining = max(remaining, MIN_TIMEOUT)
+        return tuple(remaining if value is None else min(value, remaining) for value in timeout)
+
+    def cancel(self):
+        """Stop the run, aborting its requests in flight."""
+        self._cancelled.set()
+        abort_requests(self.session)
+
+    def _expire(self):
+        self._expired.set()
+        abort_requests(self.session)
+
+    def wait_closed(self, timeout):
+        """Wait until the run is over, for watcher threads.
+
+        Returns:
+            True if the run is over.
+        """
+        return self._closed.wait(timeout)
+
+    def close(self):
+        """Stop the deadline timer once the run is over."""
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.cancel()
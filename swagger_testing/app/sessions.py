@@ -0,0 +1,166 @@
+import socket
+import threading
+import time
+import weakref
+
+import requests
+
+from requests.adapters import DEFAULT_POOLBLOCK, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+DEFAULT_POOL_SIZE = 10
+
+# Time spent opening connections by the requests of each thread
+_connect_times = threading.local()
+
+
+def reset_connect_time():
+    """Start measuring the time spent opening connections in this thread."""
+    _connect_times.total = 0.0
+
+
+def get_connect_time():
+    """Get the time spent opening connections in this thread since reset_connect_time.
+
+    Returns:
+        The time in seconds, 0 if the requests reused pooled connections.
+    """
+    return getattr(_connect_times, 'total', 0.0)
+
+
+class _TimedConnectionMixin(object):
+    """Add the duration of connect (DNS, TCP and TLS handshakes) to the thread's connect time."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super(_TimedConnectionMixin, self).connect()
+        finally:
+            _connect_times.total = get_connect_time() + time.perf_counter() - start
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class OpenConnections(object):
+    """Connections opened by the pools of a session, to abort their requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()
+
+    def add(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+
+    def abort(self):
+        """Shut the sockets of the connections down.
+
+        A request waiting for its response fails at once with a connection
+        error, instead of waiting for its timeout.
+        """
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            sock = connection.sock
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:  # Already closed
+                pass
+
+
+class _TrackedPoolMixin(object):
+    """Register the connections of the pool in its manager's OpenConnections."""
+
+    open_connections = None
+
+    def _new_conn(self):
+        connection = super(_TrackedPoolMixin, self)._new_conn()
+        if self.open_connections is not None:
+            self.open_connections.add(connection)
+        return connection
+
+
+class TimedHTTPConnectionPool(_TrackedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(_TrackedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedPoolManager(PoolManager):
+    """PoolManager of timed connection pools, keeping track of their connections."""
+
+    def __init__(self, *args, **kwargs):
+        super(TimedPoolManager, self).__init__(*args, **kwargs)
+        self.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+        self.open_connections = OpenConnections()
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(TimedPoolManager, self)._new_pool(scheme, host, port, request_context=request_context)
+        pool.open_connections = self.open_connections
+        return pool
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter measuring the time spent opening connections, see get_connect_time.
+
+    Its requests in flight can be aborted from another thread, see abort_requests.
+    """
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        # save these values for pickling
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+
+        self.poolmanager = TimedPoolManager(num_pools=connections, maxsize=maxsize,
+                                            block=block, strict=True, **pool_kwargs)
+
+    def abort_requests(self):
+        """Make the requests in flight fail at once."""
+        self.poolmanager.open_connections.abort()
+
+
+def abort_requests(session):
+    """Make the requests in flight of a session built by build_session fail at once.
+
+    Args:
+        session: requests session whose requests are aborted, from any thread.
+    """
+    for adapter in session.adapters.values():
+        if isinstance(adapter, TimedHTTPAdapter):
+            adapter.abort_requests()
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE, pool_hosts=DEFAULT_POOL_SIZE):
+    """Build a requests session keeping its connections alive between requests.
+
+    The time its requests spend opening connections is measured, see
+    get_connect_time.
+
+    Args:
+        pool_size: number of connections kept open for each host.
+        pool_hosts: number of hosts whose connection pool is kept.
+
+    Returns:
+        A requests.Session.
+    """
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
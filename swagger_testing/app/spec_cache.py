@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class SpecCache(object):
+    """Local HTTP cache of the fetched swagger specifications.
+
+    The body of a specification is stored with its ETag and Last-Modified
+    headers. A cached body younger than max_age is used as is, an older one
+    is revalidated with a conditional request and reused if the server
+    answers 304 Not Modified.
+
+    Attributes:
+        cache_dir: directory of the cache files.
+        max_age: number of seconds a cached body is used without revalidation.
+    """
+
+    _ACCEPT_ENCODING = 'gzip, deflate'
+
+    def __init__(self, cache_dir, max_age=0):
+        self.cache_dir = str(cache_dir)
+        self.max_age = max_age
+
+    def fetch(self, url, session=None, **kwargs):
+        """Get the content of the specification at the given url.
+
+        Args:
+            url: URL of the swagger specification.
+            session: requests session used to send the request (optional).
+            kwargs: extra arguments given to the get request (timeout...).
+
+        Returns:
+            The content of the specification (bytes).
+
+        Raises:
+            - requests.exceptions.RequestException: if the specification cannot be fetched.
+        """
+        body_path, meta_path = self._paths(url)
+        meta = self._load_meta(meta_path)
+        if meta is not None and time.time() - meta['fetched_at'] < self.max_age:
+            body = self._read(body_path)
+            if body is not None:
+                return body
+
+        headers = {'Accept-Encoding': self._ACCEPT_ENCODING}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = (session or requests).get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and meta is not None:
+            body = self._read(body_path)
+            if body is not None:
+                meta['fetched_at'] = time.time()
+                self._write(meta_path, json.dumps(meta).encode('utf-8'))
+                return body
+            # Body lost, fetch it again without conditions
+            response = (session or requests).get(url, headers={'Accept-Encoding': self._ACCEPT_ENCODING}, **kwargs)
+
+        response.raise_for_status()
+        body = response.content
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        if self._write(body_path, body):
+            self._write(meta_path, json.dumps(meta).encode('utf-8'))
+        return body
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return (os.path.join(self.cache_dir, key + '.body'),
+                os.path.join(self.cache_dir, key + '.json'))
+
+    def _load_meta(self, meta_path):
+        data = self._read(meta_path)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'rb') as cache_file:
+                return cache_file.read()
+        except (IOError, OSError):
+            return None
+
+    def _write(self, path, data):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as exc:
+            logger.warning(f"Cannot write spec cache file {path}: {repr(exc)}")
+            return False
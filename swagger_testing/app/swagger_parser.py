@@ -11,8 +11,6 @@ import six
 import sys
 import yaml
 
-from copy import deepcopy
-
 try:
     from StringIO import StringIO
 except ImportError:  # Python 3
@@ -20,6 +18,11 @@ except ImportError:  # Python 3
 
 from swagger_spec_validator.validator20 import validate_spec
 
+_DEFINITION_REF_REGEX = re.compile('#/definitions/(.*)')
+
+# Properties standing for the additionalProperties of an object in examples
+_ADDITIONAL_PROPERTY_NAMES = ('any_prop1', 'any_prop2')
+
 
 class SwaggerParser(object):
     """Parse a swagger YAML file.
@@ -29,13 +32,16 @@ class SwaggerParser(object):
 
     Attributes:
         specification: dict of the yaml file.
-        definitions_example: dict of definition with an example.
+        definitions_example: dict of definition with an example (only the
+                             definitions used so far in lazy mode).
         paths: dict of path with their actions, parameters, and responses.
+        router: PathRouter resolving a request path to its entry in paths.
     """
 
     _HTTP_VERBS = set(['get', 'put', 'post', 'delete', 'options', 'head', 'patch'])
+    _REF_SECTIONS = ('definitions', 'parameters', 'responses')
 
-    def __init__(self, swagger_path=None, swagger_dict=None, swagger_yaml=None, use_example=True):
+    def __init__(self, swagger_path=None, swagger_dict=None, swagger_yaml=None, use_example=True, lazy=False):
         """Run parsing from either a file or a dict.
 
         Args:
@@ -45,6 +51,8 @@ class SwaggerParser(object):
                          build definitions example (False value can be useful
                          when making test. Problem can happen if set to True, eg
                          POST {'id': 'example'}, GET /string => 404).
+            lazy: if True, definitions examples are not all built at init but
+                  the first time a definition is needed.
 
         Raises:
             - ValueError: if no swagger_path or swagger_dict is specified.
@@ -76,13 +84,123 @@ class SwaggerParser(object):
         # Run parsing
         self.use_example = use_example
         self.base_path = self.specification.get('basePath', '')
+        self.refs = {}
+        self._definition_names = {}
+        self.build_ref_index()
+        self._definition_order = {}
+        self._definition_required = {}
+        self._definitions_by_property = {}
+        self._definitions_by_required = {}
+        self._definitions_without_required = set()
+        self.build_definition_index()
+        self._validators = {}
         self.definitions_example = {}
-        self.build_definitions_example()
+        if not lazy:
+            self.build_definitions_example()
         self.paths = {}
         self.operation = {}
         self.generated_operation = {}
+        self.router = PathRouter()
         self.get_paths_data()
 
+    def __getstate__(self):
+        """Get the state to pickle, without the compiled validators (built on demand)."""
+        state = self.__dict__.copy()
+        state['_validators'] = {}
+        return state
+
+    def build_ref_index(self):
+        """Index every local $ref target of the specification.
+
+        Fill refs with the JSON pointer of each definition, parameter and
+        response (ex: "#/definitions/Pet") mapped to its object, so resolving a
+        $ref is a single dict lookup.
+        """
+        for section in self._REF_SECTIONS:
+            for name, target in (self.specification.get(section) or {}).items():
+                for ref in self._refs_from_name(section, name):
+                    self.refs[ref] = target
+                    if section == 'definitions':
+                        self._definition_names[ref] = name
+
+    @staticmethod
+    def _refs_from_name(section, name):
+        """Get the $ref values pointing to the given name of a section.
+
+        Args:
+            section: section of the specification (definitions, parameters, responses).
+            name: name of the object in the section.
+
+        Returns:
+            A list with the escaped JSON pointer, and the raw one if it differs.
+        """
+        refs = ['#/{0}/{1}'.format(section, name.replace('~', '~0').replace('/', '~1'))]
+        if '/' in name or '~' in name:
+            refs.append('#/{0}/{1}'.format(section, name))
+        return refs
+
+    def resolve_ref(self, ref):
+        """Get the object targeted by the given $ref value.
+
+        Args:
+            ref: ref value (ex: "#/parameters/limitParam")
+
+        Returns:
+            The object of the specification, or None if the ref is unknown.
+        """
+        return self.refs.get(ref)
+
+    def build_definition_index(self):
+        """Index the definitions by their property names and required keys.
+
+        Used by get_dict_definition to only validate a dict against the
+        definitions which can match its keys.
+        """
+        for position, (def_name, def_spec) in enumerate(self.specification.get('definitions', {}).items()):
+            self._definition_order[def_name] = position
+            for prop_name in def_spec.get('properties', {}):
+                self._definitions_by_property.setdefault(prop_name, set()).add(def_name)
+
+            required = frozenset(def_spec.get('required') or ())
+            self._definition_required[def_name] = required
+            if required:
+                # Any required key can be used to find the definition back
+                anchor = min(required)
+                self._definitions_by_required.setdefault(anchor, set()).add(def_name)
+            else:
+                self._definitions_without_required.add(def_name)
+
+    def _get_definition_candidates(self, dict_to_test):
+        """Get the definitions which can match the keys of the given dict.
+
+        A definition can only match if it has a property for every key with a
+        value and if all its required keys are in the dict.
+
+        Args:
+            dict_to_test: dict to test.
+
+        Returns:
+            A list of definition names, in the order of the specification.
+        """
+        keys = [key for key, value in dict_to_test.items() if value is not None]
+        if keys:
+            candidates_by_key = []
+            for key in keys:
+                definitions = self._definitions_by_property.get(key)
+                if not definitions:
+                    return []
+                candidates_by_key.append(definitions)
+            candidates_by_key.sort(key=len)
+            candidates = candidates_by_key[0].intersection(*candidates_by_key[1:])
+        else:
+            candidates = set(self._definitions_without_required)
+            for key in dict_to_test.keys():
+                candidates.update(self._definitions_by_required.get(key, ()))
+
+        return sorted((def_name for def_name in candidates
+                       if self._definition_required[def_name].issubset(dict_to_test.keys())),
+                      key=self._definition_order.__getitem__)
+
     def build_definitions_example(self):
         """Parse all definitions in the swagger specification."""
         for def_name, def_spec in self.specification.get('definitions', {}).items():
@@ -123,6 +241,21 @@ class SwaggerParser(object):
 
         return True
 
+    def get_definition_example(self, def_name):
+        """Get the example of the given definition, building it if needed.
+
+        Args:
+            def_name: Name of the definition.
+
+        Returns:
+            The example of the definition.
+
+        Raises:
+            - KeyError: if the definition does not exist.
+        """
+        self.build_one_definition_example(def_name)
+        return self.definitions_example[def_name]
+
     @staticmethod
     def check_type(value, type_def):
         """Check if the value is in the type given in type_def.
@@ -134,24 +267,7 @@ class SwaggerParser(object):
         Returns:
             True if the type is correct, False otherwise.
         """
-        if type_def == 'integer':
-            try:
-                # We accept string with integer ex: '123'
-                int(value)
-                return True
-            except ValueError:
-                return isinstance(value, six.integer_types) and not isinstance(value, bool)
-        elif type_def == 'number':
-            return isinstance(value, (six.integer_types, float)) and not isinstance(value, bool)
-        elif type_def == 'string':
-            return isinstance(value, (six.text_type, six.string_types, datetime.datetime))
-        elif type_def == 'boolean':
-            return (isinstance(value, bool) or
-                    (isinstance(value, (six.text_type, six.string_types,)) and
-                     value.lower() in ['true', 'false'])
-                    )
-        else:
-            return False
+        return _get_type_checker(type_def)(value)
 
     def get_example_from_prop_spec(self, prop_spec, from_allof=False):
         """Return an example value from a property specification.
@@ -214,44 +330,33 @@ class SwaggerParser(object):
             An example for the given spec
             A boolean, whether we had additionalProperties in the spec, or not
         """
-        local_spec = deepcopy(spec)
-
         # Handle additionalProperties if they exist
-        # we replace additionalProperties with two concrete
-        # properties so that examples can be generated
-        additional_property = False
-        if 'additionalProperties' in local_spec:
-            additional_property = True
-            if 'properties' not in local_spec:
-                local_spec['properties'] = {}
-
-            if isinstance(local_spec['additionalProperties'], bool):
-                local_spec['additionalProperties'] = {}
-
-            local_spec['properties'].update({
-                'any_prop1': local_spec['additionalProperties'],
-                'any_prop2': local_spec['additionalProperties'],
-            })
-            del(local_spec['additionalProperties'])
-            required = local_spec.get('required', [])
-            required += ['any_prop1', 'any_prop2']
-            local_spec['required'] = required
+        # we add two concrete properties having the additionalProperties spec
+        # so that examples can be generated, without changing the given spec
+        additional_property = 'additionalProperties' in spec
+        if additional_property:
+            properties = spec.get('properties', {})
+            required = spec.get('required', [])
+            property_items = _iter_with_additional_properties(properties, spec['additionalProperties'])
+        else:
+            properties = spec.get('properties')
+            if properties is None:
+                return {}, additional_property
+            required = spec.get('required', properties.keys())
+            property_items = properties.items()
 
         example = {}
-        properties = local_spec.get('properties')
-        if properties is not None:
-            required = local_spec.get('required', properties.keys())
-
-            for inner_name, inner_spec in properties.items():
-                if inner_name not in required:
-                    continue
-                partial = self.get_example_from_prop_spec(inner_spec)
-                # While get_example_from_prop_spec is supposed to return a list,
-                # we don't actually want that when recursing to build from
-                # properties
-                if isinstance(partial, list):
-                    partial = partial[0]
-                example[inner_name] = partial
+        for inner_name, inner_spec in property_items:
+            if inner_name not in required and not (additional_property and
+                                                   inner_name in _ADDITIONAL_PROPERTY_NAMES):
+                continue
+            partial = self.get_example_from_prop_spec(inner_spec)
+            # While get_example_from_prop_spec is supposed to return a list,
+            # we don't actually want that when recursing to build from
+            # properties
+            if isinstance(partial, list):
+                partial = partial[0]
+            example[inner_name] = partial
 
         return example, additional_property
 
@@ -343,7 +448,7 @@ class SwaggerParser(object):
             An example.
         """
         # Get value from definition
-        definition_name = self.get_definition_name_from_ref(prop_spec['$ref'])
+        definition_name = self._definition_name_from_ref(prop_spec['$ref'])
 
         if self.build_one_definition_example(definition_name):
             example_dict = self.definitions_example[definition_name]
@@ -366,20 +471,20 @@ class SwaggerParser(object):
         if 'schema' not in prop_spec:
             return [{}]
         elif 'type' not in prop_spec['schema']:
-            definition_name = self.get_definition_name_from_ref(prop_spec['schema']['$ref'])
+            definition_name = self._definition_name_from_ref(prop_spec['schema']['$ref'])
             if self.build_one_definition_example(definition_name):
                 return self.definitions_example[definition_name]
         elif prop_spec['schema']['type'] == 'array':  # Array with definition
             # Get value from definition
             if 'items' in prop_spec.keys():
-                definition_name = self.get_definition_name_from_ref(prop_spec['items']['$ref'])
+                definition_name = self._definition_name_from_ref(prop_spec['items']['$ref'])
             else:
                 if '$ref' in prop_spec['schema']['items']:
-                    definition_name = self.get_definition_name_from_ref(prop_spec['schema']['items']['$ref'])
+                    definition_name = self._definition_name_from_ref(prop_spec['schema']['items']['$ref'])
                 else:
-                    definition_name = self.get_definition_name_from_ref(prop_spec['schema']['items']['type'])
+                    definition_name = self._definition_name_from_ref(prop_spec['schema']['items']['type'])
                     return [definition_name]
-            return [self.definitions_example[definition_name]]
+            return [self.get_definition_example(definition_name)]
         else:
             return self.get_example_from_prop_spec(prop_spec['schema'])
 
@@ -406,8 +511,8 @@ class SwaggerParser(object):
         elif ('$ref' in prop_spec['items'].keys() or
               ('schema' in prop_spec and '$ref' in prop_spec['schema']['items'].keys())):
             # Get value from definition
-            definition_name = self.get_definition_name_from_ref(prop_spec['items']['$ref']) or \
-                self.get_definition_name_from_ref(prop_spec['schema']['items']['$ref'])
+            definition_name = self._definition_name_from_ref(prop_spec['items']['$ref']) or \
+                self._definition_name_from_ref(prop_spec['schema']['items']['$ref'])
             if self.build_one_definition_example(definition_name):
                 example_dict = self.definitions_example[definition_name]
                 if not isinstance(example_dict, dict):
@@ -445,7 +550,7 @@ class SwaggerParser(object):
             If get_list is True, return a list of definition_name.
         """
         list_def_candidate = []
-        for definition_name in self.specification['definitions'].keys():
+        for definition_name in self._get_definition_candidates(dict):
             if self.validate_definition(definition_name, dict):
                 if not get_list:
                     return definition_name
@@ -478,15 +583,13 @@ class SwaggerParser(object):
         # dict
         if isinstance(first_value, dict):
             # try to find a definition for that first value
-            definition = None
             definition_name = self.get_dict_definition(first_value)
             if definition_name is None:
-                definition = self._definition_from_example(first_value)
-                definition_name = 'self generated'
+                validator = self.compile_definition(self._definition_from_example(first_value))
+            else:
+                validator = self.get_definition_validator(definition_name)
             for item in response.values():
-                if not self.validate_definition(definition_name,
-                                                item,
-                                                definition=definition):
+                if not validator(item):
                     return False
             return True
 
@@ -509,68 +612,163 @@ class SwaggerParser(object):
         Args:
             definition_name: name of the the definition.
             dict_to_test: dict to test.
+            definition: definition spec to use instead of the named one.
 
         Returns:
             True if the given dict match the definition, False otherwise.
         """
-        if (definition_name not in self.specification['definitions'].keys() and
-                definition is None):
-            # reject unknown definition
-            return False
+        if definition:
+            validator = self.compile_definition(definition)
+        else:
+            validator = self.get_definition_validator(definition_name)
+            if validator is None:
+                # reject unknown definition
+                return False
 
-        # Check all required in dict_to_test
-        spec_def = definition or self.specification['definitions'][definition_name]
-        all_required_keys_present = all(req in dict_to_test.keys() for req in spec_def.get('required', {}))
-        if 'required' in spec_def and not all_required_keys_present:
-            return False
+        return validator(dict_to_test)
 
-        # Check no extra arg & type
-        properties_dict = spec_def.get('properties', {})
-        for key, value in dict_to_test.items():
-            if value is not None:
-                if key not in properties_dict:  # Extra arg
-                    return False
-                else:  # Check type
-                    if not self._validate_type(properties_dict[key], value):
-                        return False
+    def get_definition_validator(self, definition_name):
+        """Get the compiled validator of the given definition.
 
-        return True
+        The validator is compiled on first use and kept for the next calls.
 
-    def _validate_type(self, properties_spec, value):
-        """Validate the given value with the given property spec.
+        Args:
+            definition_name: name of the the definition.
+
+        Returns:
+            A DefinitionValidator, or None if the definition does not exist.
+        """
+        validator = self._validators.get(definition_name)
+        if validator is None:
+            spec_def = self.specification.get('definitions', {}).get(definition_name)
+            if spec_def is None:
+                return None
+            # Register before compiling so recursive definitions reuse it
+            validator = self._validators[definition_name] = DefinitionValidator()
+            self.compile_definition(spec_def, validator)
+        return validator
+
+    def compile_definition(self, spec_def, validator=None):
+        """Compile a definition spec into a validator.
 
         Args:
-            properties_dict: specification of the property to check (From definition not route).
-            value: value to check.
+            spec_def: specification of the definition.
+            validator: DefinitionValidator to fill, a new one is created if None.
 
         Returns:
-            True if the value is valid for the given spec.
+            The DefinitionValidator of the definition.
+        """
+        if validator is None:
+            validator = DefinitionValidator()
+        properties, required, additional = self._merge_all_of(spec_def, set())
+        if required is not None:
+            validator.required = tuple(required)
+        validator.properties = dict((prop_name, self._compile_property(prop_spec))
+                                    for prop_name, prop_spec in properties.items())
+        if additional is True:
+            validator.additional = _accept
+        elif isinstance(additional, dict):
+            validator.additional = self._compile_property(additional)
+        return validator
+
+    def _merge_all_of(self, spec_def, seen):
+        """Get the properties of a definition, merged with the ones of its allOf parts.
+
+        Args:
+            spec_def: specification of the definition.
+            seen: $ref values of the parts already merged, to stop on cycles.
+
+        Returns:
+            A tuple with the dict of property specs, the list of required keys
+            (None if no part has a required) and the additionalProperties
+            (None if no part has one).
+        """
+        properties = {}
+        required = None
+        additional = None
+        for part in spec_def.get('allOf') or ():
+            if not isinstance(part, dict):
+                continue
+            if '$ref' in part:
+                if part['$ref'] in seen:
+                    continue
+                seen.add(part['$ref'])
+                part = self.resolve_ref(part['$ref']) or {}
+            part_properties, part_required, part_additional = self._merge_all_of(part, seen)
+            properties.update(part_properties)
+            if part_required is not None:
+                required = (required or []) + list(part_required)
+            if part_additional is not None:
+                additional = part_additional
+        properties.update(spec_def.get('properties') or {})
+        if 'required' in spec_def and isinstance(spec_def['required'], (list, tuple)):
+            required = (required or []) + list(spec_def['required'])
+        if 'additionalProperties' in spec_def:
+            additional = spec_def['additionalProperties']
+        return properties, required, additional
+
+    def _compile_property(self, properties_spec):
+        """Compile a property spec into a function checking a value.
+
+        Args:
+            properties_spec: specification of the property to check (From definition not route).
+
+        Returns:
+            A function taking a value and returning True if it is valid for the given spec.
         """
         if 'type' not in properties_spec.keys():
             # Validate sub definition
-            def_name = self.get_definition_name_from_ref(properties_spec['$ref'])
-            return self.validate_definition(def_name, value)
+            if '$ref' in properties_spec:
+                return self._definition_checker(properties_spec['$ref'])
+            # Inline object without type
+            if 'properties' in properties_spec or 'allOf' in properties_spec:
+                return self.compile_definition(properties_spec)
+            # A schema without type accepts any value
+            return _accept
 
         # Validate array
         elif properties_spec['type'] == 'array':
-            if not isinstance(value, list):
-                return False
+            items_spec = properties_spec.get('items') or {}
+            check_item = self._compile_property(items_spec) if isinstance(items_spec, dict) else _accept
 
-            # Check type
-            if ('type' in properties_spec['items'].keys() and
-                    any(not self.check_type(item, properties_spec['items']['type']) for item in value)):
-                return False
-            # Check ref
-            elif ('$ref' in properties_spec['items'].keys()):
-                def_name = self.get_definition_name_from_ref(properties_spec['items']['$ref'])
-                if any(not self.validate_definition(def_name, item) for item in value):
+            def check_array(value):
+                if not isinstance(value, list):
+                    return False
+                return all(check_item(item) for item in value)
+            return check_array
+
+        # Validate inline object
+        elif properties_spec['type'] == 'object':
+            if 'properties' in properties_spec or 'allOf' in properties_spec:
+                return self.compile_definition(properties_spec)
+            additional = properties_spec.get('additionalProperties')
+            check_value = self._compile_property(additional) if isinstance(additional, dict) else _accept
+
+            def check_object(value):
+                if not isinstance(value, dict):
                     return False
+                return all(check_value(item) for item in value.values() if item is not None)
+            return check_object
 
         else:  # Classic types
-            if not self.check_type(value, properties_spec['type']):
-                return False
+            return _get_type_checker(properties_spec['type'])
 
-        return True
+    def _definition_checker(self, ref):
+        """Get a function validating a value against the definition of the given $ref."""
+        validator = self.get_definition_validator(self._definition_name_from_ref(ref))
+        return validator if validator is not None else _reject
+
+    def _validate_type(self, properties_spec, value):
+        """Validate the given value with the given property spec.
+
+        Args:
+            properties_dict: specification of the property to check (From definition not route).
+            value: value to check.
+
+        Returns:
+            True if the value is valid for the given spec.
+        """
+        return self._compile_property(properties_spec)(value)
 
     def get_paths_data(self):
         """Get data for each paths in the swagger specification.
@@ -580,6 +778,7 @@ class SwaggerParser(object):
         for path, path_spec in self.specification['paths'].items():
             path = u'{0}{1}'.format(self.base_path, path)
             self.paths[path] = {}
+            self.router.add(path)
 
             # Add path-level parameters
             default_parameters = {}
@@ -616,6 +815,8 @@ class SwaggerParser(object):
                 # Get mime types for this action
                 if 'consumes' in action.keys():
                     self.paths[path][http_method]['consumes'] = action['consumes']
+                if 'produces' in action.keys():
+                    self.paths[path][http_method]['produces'] = action['produces']
 
     def _add_parameters(self, parameter_map, parameter_list):
         """Populates the given parameter map with the list of parameters provided, resolving any reference objects encountered.
@@ -627,7 +828,7 @@ class SwaggerParser(object):
         for parameter in parameter_list:
             if parameter.get('$ref'):
                 # expand parameter from $ref if not specified inline
-                parameter = self.specification['parameters'].get(parameter.get('$ref').split('/')[-1])
+                parameter = self.resolve_ref(parameter['$ref'])
             parameter_map[parameter['name']] = parameter
 
     @staticmethod
@@ -640,8 +841,24 @@ class SwaggerParser(object):
         Returns:
             The definition name corresponding to the ref.
         """
-        p = re.compile('#/definitions/(.*)')
-        definition_name = re.sub(p, r'\1', ref)
+        definition_name = re.sub(_DEFINITION_REF_REGEX, r'\1', ref)
+        return definition_name
+
+    def _definition_name_from_ref(self, ref):
+        """Get the definition name of the given $ref value from the ref index.
+
+        Falls back to get_definition_name_from_ref for values which are not an
+        indexed definition ref.
+
+        Args:
+            ref: ref value (ex: "#/definitions/CustomDefinition")
+
+        Returns:
+            The definition name corresponding to the ref.
+        """
+        definition_name = self._definition_names.get(ref)
+        if definition_name is None:
+            return self.get_definition_name_from_ref(ref)
         return definition_name
 
     def get_path_spec(self, path, action=None):
@@ -656,23 +873,13 @@ class SwaggerParser(object):
             Or (None, None) if no specification is found.
         """
         # Get the specification of the given path
-        path_spec = None
-        path_name = None
-        for base_path in self.paths.keys():
-            if path == base_path:
-                path_spec = self.paths[base_path]
-                path_name = base_path
-
-        # Path parameter
-        if path_spec is None:
-            for base_path in self.paths.keys():
-                regex_from_path = re.compile(re.sub('{[^/]*}', '([^/]*)', base_path) + r'$')
-                if re.match(regex_from_path, path):
-                    path_spec = self.paths[base_path]
-                    path_name = base_path
+        path_name, path_params = self.router.match(path)
+        if path_name is None:
+            return (None, None)
+        path_spec = self.paths[path_name]
 
         # Test action if given
-        if path_spec is not None and action is not None:
+        if action is not None:
             if action not in path_spec.keys():
                 return (None, None)
             else:
@@ -680,6 +887,19 @@ class SwaggerParser(object):
 
         return (path_name, path_spec)
 
+    def match_path(self, path):
+        """Get the path name matching the given path and its path parameters.
+
+        Args:
+            path: path of the request (ex: "/v2/pet/42").
+
+        Returns:
+            A tuple with the base name of the path and a dict of the path
+            parameters captured from the request path (ex: {'petId': '42'}).
+            Or (None, {}) if no path matches.
+        """
+        return self.router.match(path)
+
     def validate_request(self, path, action, body=None, query=None):
         """Check if the given request is valid.
            Validates the body and the query
@@ -805,7 +1025,7 @@ class SwaggerParser(object):
                 elif 'schema' in param_spec.keys():
                     if 'type' in param_spec['schema'].keys() and param_spec['schema']['type'] == 'array':
                         # It is an array get value from definition
-                        definition_name = self.get_definition_name_from_ref(param_spec['schema']['items']['$ref'])
+                        definition_name = self._definition_name_from_ref(param_spec['schema']['items']['$ref'])
                         if len(body) > 0 and not self.validate_definition(definition_name, body[0]):
                             msg = "The body did not validate against its definition"
                             return False, msg
@@ -815,7 +1035,7 @@ class SwaggerParser(object):
                         msg = "Check type did not validate for {0} and {1}".format(param_spec['schema']['type'], body)
                         return False, msg
                     else:
-                        definition_name = self.get_definition_name_from_ref(param_spec['schema']['$ref'])
+                        definition_name = self._definition_name_from_ref(param_spec['schema']['$ref'])
                         if not self.validate_definition(definition_name, body):
                             msg = "The body did not validate against its definition"
                             return False, msg
@@ -831,21 +1051,23 @@ class SwaggerParser(object):
         """Get a response example from a response spec.
 
         """
+        if '$ref' in resp_spec.keys():  # Response defined in the responses section
+            resp_spec = self.resolve_ref(resp_spec['$ref']) or {}
         if 'schema' in resp_spec.keys():
             if '$ref' in resp_spec['schema']:  # Standard definition
-                definition_name = self.get_definition_name_from_ref(resp_spec['schema']['$ref'])
-                return self.definitions_example[definition_name]
+                definition_name = self._definition_name_from_ref(resp_spec['schema']['$ref'])
+                return self.get_definition_example(definition_name)
             elif 'items' in resp_spec['schema'] and resp_spec['schema']['type'] == 'array':  # Array
                 if '$ref' in resp_spec['schema']['items']:
-                    definition_name = self.get_definition_name_from_ref(resp_spec['schema']['items']['$ref'])
+                    definition_name = self._definition_name_from_ref(resp_spec['schema']['items']['$ref'])
                 else:
                     if 'type' in resp_spec['schema']['items']:
-                        definition_name = self.get_definition_name_from_ref(resp_spec['schema']['items'])
+                        definition_name = self._definition_name_from_ref(resp_spec['schema']['items'])
                         return [definition_name]
                     else:
                         logging.warn("No item type in: " + resp_spec['schema'])
                         return ''
-                return [self.definitions_example[definition_name]]
+                return [self.get_definition_example(definition_name)]
             elif 'type' in resp_spec['schema']:
                 return self.get_example_from_prop_spec(resp_spec['schema'])
         else:
@@ -905,20 +1127,250 @@ class SwaggerParser(object):
                             # It is an array
                             # Get value from definition
                             if '$ref' in spec['schema']['items']:
-                                definition_name = self.get_definition_name_from_ref(spec['schema']
-                                                                                    ['items']['$ref'])
-                                return [self.definitions_example[definition_name]]
+                                definition_name = self._definition_name_from_ref(spec['schema']
+                                                                                 ['items']['$ref'])
+                                return [self.get_definition_example(definition_name)]
                             else:
-                                definition_name = self.get_definition_name_from_ref(spec['schema']
-                                                                                    ['items']['type'])
+                                definition_name = self._definition_name_from_ref(spec['schema']
+                                                                                 ['items']['type'])
                                 return [definition_name]
                         elif 'type' in spec['schema'].keys():
                             # Type but not array
                             return self.get_example_from_prop_spec(spec['schema'])
                         else:
                             # Get value from definition
-                            definition_name = self.get_definition_name_from_ref(spec['schema']['$ref'])
-                            return self.definitions_example[definition_name]
+                            definition_name = self._definition_name_from_ref(spec['schema']['$ref'])
+                            return self.get_definition_example(definition_name)
+
+
+def _iter_with_additional_properties(properties, additional_properties):
+    """Iterate over the properties of an object with its additionalProperties.
+
+    The additionalProperties spec is given to the any_prop1 and any_prop2
+    properties, as if they were added to the properties dict.
+
+    Args:
+        properties: properties of the object.
+        additional_properties: additionalProperties of the object (spec or bool).
+
+    Yields:
+        (name, spec) for each property.
+    """
+    if isinstance(additional_properties, bool):
+        additional_properties = {}
+
+    for prop_name, prop_spec in properties.items():
+        if prop_name in _ADDITIONAL_PROPERTY_NAMES:
+            yield prop_name, additional_properties
+        else:
+            yield prop_name, prop_spec
+
+    for prop_name in _ADDITIONAL_PROPERTY_NAMES:
+        if prop_name not in properties:
+            yield prop_name, additional_properties
+
+
+class DefinitionValidator(object):
+    """Validator compiled from a definition of the specification.
+
+    Attributes:
+        required: tuple of the required keys, None if the definition has no required.
+        properties: dict of property name to a function checking its value.
+        additional: function checking the value of the keys which are not
+                    properties (additionalProperties), None to reject them.
+    """
+
+    __slots__ = ('required', 'properties', 'additional')
+
+    def __init__(self):
+        self.required = None
+        self.properties = {}
+        self.additional = None
+
+    def __call__(self, dict_to_test):
+        """Validate the given dict.
+
+        Args:
+            dict_to_test: dict to test.
+
+        Returns:
+            True if the given dict match the definition, False otherwise.
+        """
+        if not isinstance(dict_to_test, dict):
+            return False
+
+        # Check all required in dict_to_test
+        if self.required is not None:
+            for req in self.required:
+                if req not in dict_to_test:
+                    return False
+
+        # Check no extra arg & type
+        properties = self.properties
+        for key, value in dict_to_test.items():
+            if value is not None:
+                check = properties.get(key, self.additional)
+                if check is None or not check(value):  # Extra arg or wrong type
+                    return False
+
+        return True
+
+
+def _check_integer(value):
+    try:
+        # We accept string with integer ex: '123'
+        int(value)
+        return True
+    except (TypeError, ValueError):  # Not a number, e.g. a list or a dict
+        return isinstance(value, six.integer_types) and not isinstance(value, bool)
+
+
+def _check_number(value):
+    return isinstance(value, (six.integer_types, float)) and not isinstance(value, bool)
+
+
+def _check_string(value):
+    return isinstance(value, (six.text_type, six.string_types, datetime.datetime))
+
+
+def _check_boolean(value):
+    return (isinstance(value, bool) or
+            (isinstance(value, (six.text_type, six.string_types,)) and
+             value.lower() in ['true', 'false'])
+            )
+
+
+def _reject(value):
+    return False
+
+
+def _accept(value):
+    return True
+
+
+_TYPE_CHECKERS = {
+    'integer': _check_integer,
+    'number': _check_number,
+    'string': _check_string,
+    'boolean': _check_boolean,
+}
+
+
+def _get_type_checker(type_def):
+    """Get the function checking a value against the given swagger type."""
+    if not isinstance(type_def, six.string_types):
+        return _reject
+    return _TYPE_CHECKERS.get(type_def, _reject)
+
+
+class PathRouter(object):
+    """Resolve request paths to swagger path templates.
+
+    The templates are stored in a segment trie built once, so a lookup only
+    walks the segments of the requested path instead of testing a regex for
+    every path of the specification.
+
+    Attributes:
+        root: root node of the trie.
+    """
+
+    _PARAM_REGEX = re.compile('{([^/}]*)}')
+
+    def __init__(self):
+        self.root = _RouteNode()
+
+    def add(self, path_name):
+        """Add a path template (ex: "/v2/pet/{petId}") to the router.
+
+        Args:
+            path_name: path template as written in the paths of the swagger.
+        """
+        node = self.root
+        param_names = []
+        for segment in path_name.split('/'):
+            names = self._PARAM_REGEX.findall(segment)
+            if not names:  # Literal segment
+                node = node.literals.setdefault(segment, _RouteNode())
+            elif segment == '{{{0}}}'.format(names[0]):  # Whole segment parameter
+                if node.param is None:
+                    node.param = _RouteNode()
+                node = node.param
+            else:  # Parameters inside a literal segment (ex: "{orderId}.json")
+                pattern = ''.join(re.escape(part) if i % 2 == 0 else '([^/]*)'
+                                  for i, part in enumerate(self._PARAM_REGEX.split(segment)))
+                for regex, child in node.patterns:
+                    if regex.pattern == pattern + '$':
+                        node = child
+                        break
+                else:
+                    child = _RouteNode()
+                    node.patterns.append((re.compile(pattern + '$'), child))
+                    node = child
+            param_names.extend(names)
+        if node.path_name is None:
+            node.path_name = path_name
+            node.param_names = tuple(param_names)
+
+    def match(self, path):
+        """Get the path template matching the given path.
+
+        Literal segments are preferred over templated ones.
+
+        Args:
+            path: path of the request.
+
+        Returns:
+            A tuple with the path template and a dict of the captured path
+            parameters, or (None, {}) if no template matches.
+        """
+        values = []
+        node = self._match(self.root, path.split('/'), 0, values)
+        if node is None:
+            return (None, {})
+        return (node.path_name, dict(zip(node.param_names, values)))
+
+    def _match(self, node, segments, index, values):
+        """Depth first search of the node matching segments[index:]."""
+        if index == len(segments):
+            return node if node.path_name is not None else None
+
+        segment = segments[index]
+        child = node.literals.get(segment)
+        if child is not None:
+            found = self._match(child, segments, index + 1, values)
+            if found is not None:
+                return found
+
+        for regex, child in node.patterns:
+            match = regex.match(segment)
+            if match is not None:
+                values.extend(match.groups())
+                found = self._match(child, segments, index + 1, values)
+                if found is not None:
+                    return found
+                del values[-len(match.groups()):]
+
+        if node.param is not None:
+            values.append(segment)
+            found = self._match(node.param, segments, index + 1, values)
+            if found is not None:
+                return found
+            values.pop()
+
+        return None
+
+
+class _RouteNode(object):
+    """Node of the PathRouter trie, one per path segment."""
+
+    __slots__ = ('literals', 'patterns', 'param', 'path_name', 'param_names')
+
+    def __init__(self):
+        self.literals = {}
+        self.patterns = []
+        self.param = None
+        self.path_name = None
+        self.param_names = ()
 
 
 def _validate_post_body(actual_request_body, body_specification):
@@ -933,7 +1385,7 @@ def _validate_post_body(actual_request_body, body_specification):
         return True, ""
 
     # Are there required parameters? - there is only ONE body, so we check that one
-    parameters_required = body_specification['parameters']['body']['required']
+    parameters_required = body_specification['parameters']['body'].get('required', False)
 
     # What if it says 'required' but there is no schema ? - we reject it
     schema_present = body_specification['parameters']['body'].get('schema')
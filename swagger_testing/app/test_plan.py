@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+import requests
+
+# Bump when PreparedRequest or TestPlan change, so cached plans are not reused.
+PLAN_VERSION = 3
+
+# URL used to encode request bodies, which do not depend on the URL
+_ENCODING_URL = 'http://localhost/'
+
+PreparedRequest = namedtuple('PreparedRequest', ['operation', 'path', 'action', 'method', 'url', 'full_path',
+                                                 'headers', 'body', 'expected_status_codes', 'operation_tests',
+                                                 'item_definitions'])
+PreparedRequest.__doc__ = """Request of the tests of one or more expected status codes, ready to be sent.
+
+Attributes:
+    operation: operation id.
+    path: path of the operation in the specification.
+    action: HTTP method of the operation.
+    method: HTTP method sent (patch to test a 405).
+    url: url shown in the result, without the base URL of the api.
+    full_path: URL the request is sent to.
+    headers: tuple of (name, value) headers.
+    body: encoded body (bytes), or None.
+    expected_status_codes: tuple of the status codes checked against the response,
+                           the expected status codes of an operation sharing the same request.
+    operation_tests: number of tests of the operation.
+    item_definitions: tuple with, for each expected status code, the definition
+                      of the items of its array response (None if the response
+                      is not an array of definitions).
+"""
+
+
+def encode_body(method, headers, body=None, files=None):
+    """Encode a request body the way requests sends it.
+
+    Args:
+        method: HTTP method.
+        headers: list of (name, value) headers.
+        body: str body, or dict of form fields.
+        files: dict of files to send as multipart form data.
+
+    Returns:
+        A tuple with the headers (tuple of (name, value), with the
+        Content-Type of the encoded body) and the body as bytes (or None).
+    """
+    prepared = requests.Request(method.upper(), _ENCODING_URL, headers=dict(headers),
+                                data=body, files=files).prepare()
+    encoded = prepared.body
+    if isinstance(encoded, str):
+        encoded = encoded.encode('utf-8')
+    # requests sets the length again when sending the body
+    prepared.headers.pop('Content-Length', None)
+    return tuple(prepared.headers.items()), encoded or None
+
+
+class TestPlan(object):
+    """Immutable list of the requests testing a specification.
+
+    A plan only depends on the specification and the extra headers, so it is
+    built once and cached: running it does no work on the specification.
+
+    Attributes:
+        app_url: base URL of the api.
+        requests: tuple of PreparedRequest, grouped by path.
+        operations: number of operations tested.
+        definitions: dict of the definitions needed to validate the items of
+                     the array responses, see ItemValidators.
+    """
+
+    __slots__ = ('app_url', 'requests', 'operations', 'definitions')
+
+    def __init__(self, app_url, requests, operations, definitions=None):
+        self.app_url = app_url
+        self.requests = tuple(requests)
+        self.operations = operations
+        self.definitions = definitions or {}
+
+    def __iter__(self):
+        return iter(self.requests)
+
+    def __len__(self):
+        return len(self.requests)
@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+_PATH_DONE = object()
+
+
+class PathPoolStats(object):
+    """Timing of a run of iter_by_path.
+
+    Attributes:
+        workers: number of threads of the pool.
+        paths: number of paths tested.
+        requests: number of requests sent.
+        busy_time: sum of the time spent sending requests, i.e. the estimated
+                   duration of a sequential run [in seconds].
+        wall_time: duration of the run [in seconds].
+    """
+
+    __slots__ = ('workers', 'paths', 'requests', 'busy_time', 'wall_time')
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self.paths = 0
+        self.requests = 0
+        self.busy_time = 0.0
+        self.wall_time = 0.0
+
+    @property
+    def speedup(self):
+        """Speedup of the run against a sequential run."""
+        if self.wall_time <= 0:
+            return 1.0
+        return self.busy_time / self.wall_time
+
+    def __str__(self):
+        return (f"Ran {self.requests} requests on {self.paths} paths with {self.workers} workers "
+                f"in {self.wall_time:.2f}s, sequential estimate {self.busy_time:.2f}s "
+                f"(speedup x{self.speedup:.1f})")
+
+
+class _Failure(object):
+    """Exception raised in a worker, to re-raise in the caller thread."""
+
+    __slots__ = ('exc',)
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def iter_by_path(test_requests, send, workers=10, stats=None):
+    """Send test requests with a thread pool, running different paths in parallel.
+
+    The requests of one path are sent one after the other in their given
+    order (the _HTTP_METHODS order), so a resource is still created before
+    being read and deleted.
+
+    Args:
+        test_requests: iterable of PreparedRequest grouped by path (or TestResult,
+                       passed through).
+        send: function sending a PreparedRequest and returning its result.
+        workers: number of threads, i.e. paths tested at the same time.
+        stats: PathPoolStats to fill with the timing of the run (optional).
+
+    Returns:
+        Yield the result of each test as it completes.
+    """
+    if stats is None:
+        stats = PathPoolStats()
+    stats.workers = workers
+    results = queue.Queue()
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    def run_path(path_requests):
+        try:
+            for test_request in path_requests:
+                if stop.is_set():
+                    break
+                start = time.perf_counter()
+                result = send(test_request)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats.requests += 1
+                    stats.busy_time += elapsed
+                results.put(result)
+        except BaseException as exc:
+            results.put(_Failure(exc))
+        finally:
+            results.put(_PATH_DONE)
+
+    def wait_one_path():
+        """Yield the results received until a path is done."""
+        while True:
+            result = results.get()
+            if result is _PATH_DONE:
+                return
+            if isinstance(result, _Failure):
+                raise result.exc
+            yield result
+
+    start = time.perf_counter()
+    running = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                for path, path_requests in groupby(test_requests, key=lambda x: getattr(x, 'path', None)):
+                    if path is None:  # Already results
+                        yield from path_requests
+                        continue
+
+                    # Only keep a bounded number of paths waiting for a worker
+                    while running >= workers * 2:
+                        yield from wait_one_path()
+                        running -= 1
+
+                    executor.submit(run_path, list(path_requests))
+                    running += 1
+                    stats.paths += 1
+
+                while running:
+                    yield from wait_one_path()
+                    running -= 1
+            finally:
+                stop.set()
+    finally:
+        stats.wall_time = time.perf_counter() - start
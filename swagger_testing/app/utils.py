@@ -1,16 +1,34 @@
+import functools
 import json
 import requests
 import logging
 import six
 import time
+import urllib3
+from django.conf import settings
 from django.contrib import messages
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
 
 try:
     from urllib import urlencode
 except ImportError:  # Python 3
     from urllib.parse import urlencode
 
-from app.swagger_parser import SwaggerParser
+from app.array_validation import ItemValidators, array_item_definition, referenced_definitions, validate_json_array
+from app.async_runner import iter_concurrently
+from app.circuit_breaker import HostCircuitBreakers
+from app.latency import RequestTiming
+from app.models import TestRun
+from app.parse_cache import ParseCache, spec_hash
+from app.rate_limit import RateLimiter
+from app.results import RunRecorder
+from app.run_control import RequestTimeouts, RunControl
+from app.sessions import DEFAULT_POOL_SIZE, build_session, get_connect_time, reset_connect_time
+from app.spec_cache import SpecCache
+from app.test_plan import PLAN_VERSION, PreparedRequest, TestPlan, encode_body
+from app.thread_runner import PathPoolStats, iter_by_path
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
@@ -20,6 +38,41 @@ logger.setLevel(logging.WARNING)
 # HTTP methods (http://swagger.io/specification/#pathItemObject):
 _HTTP_METHODS = ['post', 'put', 'get', 'options', 'head', 'patch', 'delete']
 
+# Size of the chunks of a streamed response body [in bytes]
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def get_parse_cache():
+    """Get the on-disk cache of parsed specifications configured in the settings."""
+    return ParseCache(settings.SWAGGER_PARSE_CACHE_DIR,
+                      max_size=getattr(settings, 'SWAGGER_PARSE_CACHE_MAX_SIZE', 256 * 1024 * 1024))
+
+
+def get_spec_cache():
+    """Get the HTTP cache of fetched specifications configured in the settings."""
+    return SpecCache(settings.SWAGGER_SPEC_CACHE_DIR,
+                     max_age=getattr(settings, 'SWAGGER_SPEC_CACHE_MAX_AGE', 0))
+
+
+def get_request_timeouts():
+    """Get the timeouts of the test requests configured in the settings."""
+    return RequestTimeouts(connect=getattr(settings, 'SWAGGER_TEST_CONNECT_TIMEOUT', None),
+                           read=getattr(settings, 'SWAGGER_TEST_READ_TIMEOUT', None),
+                           operations=getattr(settings, 'SWAGGER_TEST_OPERATION_TIMEOUTS', {}))
+
+
+def get_circuit_breakers():
+    """Get the circuit breakers of the hosts of a run, configured in the settings."""
+    return HostCircuitBreakers(failure_threshold=getattr(settings, 'SWAGGER_TEST_CIRCUIT_BREAKER_FAILURES', 5),
+                               recovery_timeout=getattr(settings, 'SWAGGER_TEST_CIRCUIT_BREAKER_RECOVERY', 10.0))
+
+
+def get_item_validators(plan):
+    """Get the validators of the items of the array responses of a plan, None if disabled in the settings."""
+    if not getattr(settings, 'SWAGGER_TEST_VALIDATE_ARRAY_ITEMS', True):
+        return None
+    return ItemValidators(plan.definitions, max_failures=getattr(settings, 'SWAGGER_TEST_MAX_INVALID_ITEMS', 10))
+
 
 def get_request_args(path, action, swagger_parser):
     """
@@ -161,55 +214,336 @@ def validate_definition(swagger_parser, valid_response, response):
         assert len(set(valid_definition).intersection(actual_definition)) >= 1
 
 
-def swagger_test_yield(app_url=None, wait_time_between_tests=0, extra_headers={},request=None):
+class TestResult(object):
+    """Result of a test, str() gives the message shown to the user.
+
+    Attributes:
+        outcome: PASSED, FAILED, ERROR, TIMEOUT (no response in time, or
+                 not sent before the deadline of the run) or SKIPPED (not sent
+                 because the host cannot be reached, see CircuitBreaker).
+        message: result message.
+        test_request: PreparedRequest of the test, None if no request could be built.
+        status_code: status code returned by the api, None if there was no response.
+        timing: RequestTiming of the request, None if there was no response. The
+                results of the expected status codes of a request share its timing.
+        expected_status_code: status code checked by the test, None if no request could be built.
+    """
+
+    PASSED = 'passed'
+    FAILED = 'failed'
+    ERROR = 'error'
+    TIMEOUT = 'timeout'
+    SKIPPED = 'skipped'
+
+    __slots__ = ('outcome', 'message', 'test_request', 'status_code', 'timing', 'expected_status_code')
+
+    def __init__(self, outcome, message, test_request=None, status_code=None, timing=None,
+                 expected_status_code=None):
+        self.outcome = outcome
+        self.message = message
+        self.test_request = test_request
+        self.status_code = status_code
+        self.timing = timing
+        self.expected_status_code = expected_status_code
+
+    @property
+    def passed(self):
+        return self.outcome == self.PASSED
+
+    def __str__(self):
+        return self.message
+
+
+class SwaggerLoadError(ValueError):
+    """The swagger specification cannot be fetched or used for tests."""
+
+
+def swagger_test_yield(app_url=None, wait_time_between_tests=0, extra_headers={},request=None, session=None,
+                       concurrency=None, per_host_concurrency=None, in_order=False, workers=None,
+                       rate_limit=None, burst=1, timeouts=None, deadline=None):
     """Test the given swagger api Yield the action and operation done for each test.
 
     Args:
         app_url: URL of the swagger api.
         wait_time_between_tests: an number that will be used as waiting time between tests [in seconds].
+                                 Same as a rate_limit of 1 / wait_time_between_tests.
         extra_headers: additional headers you may want to send for all operations
+        session: requests session used for every request of the run. A pooled
+                 session is created for the run (and closed after it) if None.
+        concurrency: if set, run the tests with the asyncio engine, with at
+                     most this number of requests in flight.
+        per_host_concurrency: maximum number of requests in flight for one host
+                              with the asyncio engine (concurrency if None).
+        in_order: with the asyncio engine, yield the results in the order of
+                  the tests instead of as they complete.
+        workers: if set, run the tests with a pool of this number of threads,
+                 testing different paths in parallel while the operations of
+                 one path keep the _HTTP_METHODS order.
+        rate_limit: maximum number of requests per second sent to the api.
+                    The rate is lowered when the api answers 429/503 and
+                    raised back afterwards.
+        burst: number of requests which can be sent at once under rate_limit.
+        timeouts: RequestTimeouts of the requests, the ones of the settings if None.
+        deadline: maximum duration of the run [in seconds]. The requests in
+                  flight are aborted when it passes, and the tests left are
+                  reported as timed out without being sent.
 
     Returns:
-        Yield between each test: (action, operation)
+        Yield the result message of each test. Errors with the specification
+        are reported with django messages if a request is given, logged otherwise.
 
     Raises:
         ValueError: In case you specify neither a swagger.yaml path or an app URL.
     """
-    # Get swagger json response and parse it
+    try:
+        for result in iter_test_results(app_url=app_url, wait_time_between_tests=wait_time_between_tests,
+                                        extra_headers=extra_headers, request=request, session=session,
+                                        concurrency=concurrency, per_host_concurrency=per_host_concurrency,
+                                        in_order=in_order, workers=workers, rate_limit=rate_limit, burst=burst,
+                                        timeouts=timeouts, deadline=deadline):
+            yield str(result)
+    except SwaggerLoadError as exc:
+        if request is not None:
+            messages.error(request, str(exc))
+        else:
+            logger.error(str(exc))
+
 
+def iter_test_results(app_url=None, wait_time_between_tests=0, extra_headers={}, request=None, session=None,
+                      concurrency=None, per_host_concurrency=None, in_order=False, workers=None,
+                      rate_limit=None, burst=1, timeouts=None, deadline=None):
+    """Same as swagger_test_yield, yielding a TestResult for each test.
+
+    Raises:
+        SwaggerLoadError: if the specification cannot be used, with the
+                          message to show to the user.
+    """
+    own_session = session is None
+    if own_session:
+        session = build_runner_session(max(per_host_concurrency or concurrency or workers or 0, 0))
+    timeouts = timeouts or get_request_timeouts()
+    # The deadline covers the fetch of the specification too
+    control = RunControl(session, deadline=deadline)
     try:
-        swagger_json = requests.get(app_url)
-        remote_swagger_def = swagger_json.json()
-    except:
-        messages.error(request, f"You must specify a valid swagger.json path.: {app_url}")
-        return
+        plan = load_test_plan(app_url, extra_headers=extra_headers, session=session, timeouts=timeouts,
+                              control=control)
+        print(f"Starting runing tests for {plan.app_url} using examples.")
+        logger.info(f"Starting runing tests for {plan.app_url} using examples.")
+
+        if rate_limit is None and wait_time_between_tests > 0:
+            rate_limit = 1.0 / wait_time_between_tests
+        stats = PathPoolStats() if workers else None
+        yield from run_test_plan(plan, session, concurrency=concurrency, per_host_concurrency=per_host_concurrency,
+                                 in_order=in_order, workers=workers, rate_limit=rate_limit, burst=burst,
+                                 stats=stats, timeouts=timeouts, control=control,
+                                 circuit_breakers=get_circuit_breakers(),
+                                 max_body_size=getattr(settings, 'SWAGGER_TEST_MAX_BODY_SIZE', None),
+                                 item_validators=get_item_validators(plan))
+        if stats is not None:
+            logger.info(str(stats))
+            if request is not None:
+                messages.info(request, str(stats))
+    finally:
+        control.close()
+        if own_session:
+            session.close()
+
+
+def build_runner_session(concurrency=0):
+    """Build the pooled session of a run, configured in the settings.
+
+    Args:
+        concurrency: number of requests sent at the same time to a host.
+
+    Returns:
+        A requests.Session.
+    """
+    pool_size = getattr(settings, 'SWAGGER_TEST_POOL_SIZE', DEFAULT_POOL_SIZE)
+    return build_session(pool_size=max(pool_size, concurrency),
+                         pool_hosts=getattr(settings, 'SWAGGER_TEST_POOL_HOSTS', DEFAULT_POOL_SIZE))
+
+
+def run_test_plan(plan, session, concurrency=None, per_host_concurrency=None, in_order=False, workers=None,
+                  rate_limit=None, burst=1, stats=None, timeouts=None, control=None, circuit_breakers=None,
+                  max_body_size=None, item_validators=None):
+    """Send the requests of a test plan.
 
+    Args:
+        plan: TestPlan to run.
+        session: requests session used for every request.
+        stats: PathPoolStats filled when running with workers (optional).
+        timeouts: RequestTimeouts of the requests (optional).
+        control: RunControl of the deadline and cancellation of the run (optional).
+                 No more results are yielded once the run is cancelled.
+        circuit_breakers: HostCircuitBreakers skipping the requests to unreachable hosts (optional).
+        max_body_size: maximum number of bytes read from each response body,
+                       the whole body is read if None.
+        item_validators: ItemValidators of the plan (optional). The items of the
+                         array responses are then all validated while they are
+                         received, see send_prepared_request.
+        Other arguments: see swagger_test_yield.
+
+    Returns:
+        Yield a TestResult for each test.
+    """
+    rate_limiter = RateLimiter(rate_limit, burst=burst) if rate_limit else None
+    send = functools.partial(send_test_request, session, rate_limiter=rate_limiter, timeouts=timeouts,
+                             control=control, circuit_breakers=circuit_breakers, max_body_size=max_body_size,
+                             item_validators=item_validators)
+    # Each request gives the results of its expected status codes
+    if workers:
+        request_results = iter_by_path(plan, send, workers=workers, stats=stats)
+    elif concurrency:
+        request_results = iter_concurrently(plan, send, concurrency=concurrency,
+                                            per_host_concurrency=per_host_concurrency, in_order=in_order)
+    else:
+        request_results = map(send, plan)
+    for results in request_results:
+        if control is not None and control.cancelled:
+            break
+        yield from results
+
+
+def fetch_swagger(app_url, session=None, timeouts=None, control=None):
+    """Fetch the swagger specification at the given URL.
+
+    Args:
+        app_url: URL of the swagger specification.
+        session: requests session used to fetch the specification (optional).
+        timeouts: RequestTimeouts of the request, the ones of the settings if None.
+        control: RunControl of the run, cutting the timeouts to its deadline (optional).
+
+    Returns:
+        The content of the specification (bytes).
+
+    Raises:
+        SwaggerLoadError: if the specification cannot be fetched.
+    """
+    timeouts = timeouts or get_request_timeouts()
+    timeout = (timeouts.connect, timeouts.read)
+    if control is not None:
+        timeout = control.timeout(timeout)
+    try:
+        return get_spec_cache().fetch(app_url, session=session, timeout=timeout)
+    except Exception:
+        raise SwaggerLoadError(f"You must specify a valid swagger.json path.: {app_url}")
+
+
+def parse_swagger(swagger_content, app_url):
+    """Parse a fetched swagger specification.
+
+    Args:
+        swagger_content: content of the specification.
+        app_url: URL of the swagger specification, for the error messages.
+
+    Returns:
+        A tuple with the SwaggerParser and the base URL of the api.
+
+    Raises:
+        SwaggerLoadError: if the specification cannot be used, with the
+                          message to show to the user.
+    """
+    # Reuse the parsed specification if it has not changed since the last run
     try:
-        swagger_parser = SwaggerParser(swagger_dict=remote_swagger_def, use_example=True)
+        swagger_parser = get_parse_cache().get_or_parse(swagger_content, use_example=True, lazy=True)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise SwaggerLoadError(f"You must specify a valid swagger.json path.: {app_url}")
     except ValueError as exc:
         error = str(exc).split(":")[0]
-        messages.error(request, f"Invalid swagger: {error}")
-        return
+        raise SwaggerLoadError(f"Invalid swagger: {error}")
 
     try:
         app_url = swagger_parser.specification["schemes"][0] + "://" + swagger_parser.specification["host"] + swagger_parser.specification["basePath"]
         if app_url.endswith("//"):
             app_url = app_url.rstrip('//') + '/'
     except KeyError:
-        messages.error(request, f"JSON doesn't contain schemes, host or basePath")
-        return
+        raise SwaggerLoadError(f"JSON doesn't contain schemes, host or basePath")
+
+    return swagger_parser, app_url
+
+
+def load_swagger(app_url, session=None):
+    """Fetch and parse the swagger specification at the given URL.
+
+    Args:
+        app_url: URL of the swagger specification.
+        session: requests session used to fetch the specification (optional).
+
+    Returns:
+        A tuple with the SwaggerParser and the base URL of the api.
+
+    Raises:
+        SwaggerLoadError: if the specification cannot be used, with the
+                          message to show to the user.
+    """
+    return parse_swagger(fetch_swagger(app_url, session=session), app_url)
 
-    print(f"Starting runing tests for {app_url} using examples.")
-    logger.info(f"Starting runing tests for {app_url} using examples.")
 
+def load_test_plan(app_url, extra_headers={}, session=None, timeouts=None, control=None):
+    """Get the test plan of the swagger specification at the given URL.
+
+    The plan is cached with the parsed specifications, so the specification
+    is only parsed and planned again when it changes.
+
+    Args:
+        app_url: URL of the swagger specification.
+        extra_headers: additional headers you may want to send for all operations
+        session: requests session used to fetch the specification (optional).
+        timeouts: RequestTimeouts of the fetch, the ones of the settings if None.
+        control: RunControl of the run, cutting the fetch to its deadline (optional).
+
+    Returns:
+        A TestPlan.
+
+    Raises:
+        SwaggerLoadError: if the specification cannot be used, with the
+                          message to show to the user.
+    """
+    swagger_content = fetch_swagger(app_url, session=session, timeouts=timeouts, control=control)
+    parse_cache = get_parse_cache()
+    plan_cache_key = spec_hash(swagger_content, test_plan=PLAN_VERSION, extra_headers=sorted(extra_headers.items()))
+    plan = parse_cache.get(plan_cache_key)
+    if plan is None:
+        swagger_parser, api_url = parse_swagger(swagger_content, app_url)
+        plan = build_test_plan(swagger_parser, api_url, extra_headers)
+        parse_cache.set(plan_cache_key, plan)
+    return plan
+
+
+def build_test_plan(swagger_parser, app_url, extra_headers={}):
+    """Prepare the request of each test of the given specification.
+
+    Operations of a path are ordered as in _HTTP_METHODS, so that the
+    resource is created before being read and deleted. The arguments and
+    body of an operation are computed and encoded once for all its expected
+    status codes, and the expected status codes needing the same request
+    share one PreparedRequest: the request is sent once and its response is
+    checked against each of them.
+
+    Args:
+        swagger_parser: instance of SwaggerParser.
+        app_url: base URL of the api.
+        extra_headers: additional headers you may want to send for all operations
+
+    Returns:
+        A TestPlan.
+    """
     # Sort operation by action in order of _HTTP_METHODS
     operation_sorted = {}
     operations = swagger_parser.operation.copy()
     operations.update(swagger_parser.generated_operation)
-    for operation, request in operations.items():
-        path = request[0]
-        operation_sorted[path] = operation_sorted.get(path, []) + [(operation, request)]
+    for operation, operation_request in operations.items():
+        path = operation_request[0]
+        operation_sorted[path] = operation_sorted.get(path, []) + [(operation, operation_request)]
+
+    if app_url.endswith(swagger_parser.base_path):
+        base_url = app_url[:-len(swagger_parser.base_path)]
+    else:
+        base_url = app_url
 
+    prepared_requests = []
+    tested_operations = 0
+    item_definition_names = set()
     # Sort operations for each endpoint based on _HTTP_METHODS
     for path, operations in operation_sorted.items():
         sorted_operations = sorted(operations, key=lambda x: _HTTP_METHODS.index(x[1][1]))
@@ -220,81 +554,337 @@ def swagger_test_yield(app_url=None, wait_time_between_tests=0, extra_headers={}
             try:
                 body_req = swagger_parser.get_send_request_correct_body(path, action)
                 response_spec = swagger_parser.get_request_data(path, action, body_req)
+                url, body, headers, files, query_params = get_url_body_from_request(action, path, request_args, swagger_parser)
+                headers.extend([(key, value) for key, value in extra_headers.items()])
+                valid_request = encode_body(action, headers, body, files)
+                invalid_request = encode_body(action, headers, "'body'") if 400 in response_spec else None
             except (TypeError, ValueError) as exc:
                 logger.warning(f"Error in the swagger file: {repr(exc)}")
                 continue
 
-            for expected_status_code, status_code_spec in response_spec.items():
-                url, body, headers, files, query_params = get_url_body_from_request(action, path, request_args, swagger_parser)
-                headers.extend([(key, value) for key, value in extra_headers.items()])
+            tested_operations += 1
+            item_definitions = get_item_definitions(swagger_parser, path, action)
+            item_definition_names.update(item_definitions.values())
+            # Expected status codes by request, in the order of the specification
+            grouped_requests = {}
+            for expected_status_code in response_spec:
+                test_url = url
                 if query_params and expected_status_code != 400:
-                    url = f"{url}?{urlencode(query_params)}"
+                    test_url = f"{test_url}?{urlencode(query_params)}"
 
 
-                if url.startswith("//"):
-                    url = url.replace('//', '/')
+                if test_url.startswith("//"):
+                    test_url = test_url.replace('//', '/')
 
-                test_action = None
+                method = action
+                test_headers, test_body = valid_request
                 if expected_status_code == 400:
-                    body = "'body'"
-                    url = f"{url}?{urlencode({'invalid': 'test'})}"
+                    test_headers, test_body = invalid_request
+                    test_url = f"{test_url}?{urlencode({'invalid': 'test'})}"
                 elif expected_status_code == 405:
-                    test_action = 'patch'
+                    method = 'patch'
 
-                if app_url.endswith(swagger_parser.base_path):
-                    base_url = app_url[:-len(swagger_parser.base_path)]
-                else:
-                    base_url = app_url
+                grouped_requests.setdefault((method, test_url, test_headers, test_body), []).append(expected_status_code)
 
-                full_path = f"{base_url}{url}"
+            for (method, test_url, test_headers, test_body), expected_status_codes in grouped_requests.items():
+                prepared_requests.append(PreparedRequest(operation[0], path, action, method, test_url,
+                                                         f"{base_url}{test_url}", test_headers, test_body,
+                                                         tuple(expected_status_codes), len(response_spec),
+                                                         tuple(item_definitions.get(str(expected_status_code))
+                                                               for expected_status_code in expected_status_codes)))
 
-                if action not in _HTTP_METHODS:
-                    yield (f"Action '{action}' is not recognized; needs to be one of {str(_HTTP_METHODS)}")
-                    continue
+    return TestPlan(app_url, prepared_requests, tested_operations,
+                    referenced_definitions(swagger_parser, item_definition_names))
 
-                try:
-                    if test_action:
-                        response = requests.__getattribute__(test_action)(full_path, headers=dict(headers), data=body, files=files)
-                    else:
-                        response = requests.__getattribute__(action)(full_path, headers=dict(headers), data=body, files=files)
-                except requests.exceptions.ConnectionError as exc:
-                    yield (f"Connection error: {repr(exc)}")
-                    continue
 
-                if wait_time_between_tests > 0:
-                    time.sleep(wait_time_between_tests)
-
-                if str(expected_status_code) == str(response.status_code) or expected_status_code == 'default' or expected_status_code == '200':
-                    yield (f"Returned: {response.status_code} Expected: {expected_status_code} PASSED {action.upper()} {url}")
-                else:
-                    yield (f"Returned: {response.status_code} Expected: {expected_status_code} FAILED {action.upper()} {url}")
+def get_item_definitions(swagger_parser, path, action):
+    """Get the definitions of the items of the array responses of an operation.
 
+    Args:
+        swagger_parser: instance of SwaggerParser.
+        path: path of the operation.
+        action: HTTP method of the operation.
 
-def swagger_test(app_url=None, wait_time_between_tests=0, extra_headers={}, request=None):
+    Returns:
+        A dict of definition names by status code (str), for the responses
+        which are an array of definitions.
     """
+    _, action_spec = swagger_parser.get_path_spec(path, action)
+    item_definitions = {}
+    for status_code, resp_spec in ((action_spec or {}).get('responses') or {}).items():
+        definition_name = array_item_definition(swagger_parser, resp_spec)
+        if definition_name is not None:
+            item_definitions[str(status_code)] = definition_name
+    return item_definitions
+
+
+def send_prepared_request(session, test_request, timeout=None, max_body_size=None, item_validators=None):
+    """Send a prepared request and measure its timing.
+
     Args:
-        app_url: URL of the swagger api.
-        wait_time_between_tests: an number that will be used as waiting time between tests [in seconds].
-        extra_headers: additional headers you may want to send for all operations
+        session: requests session used to send the request.
+        test_request: PreparedRequest to send.
+        timeout: (connect, read) timeouts of the request [in seconds], None to wait forever.
+        max_body_size: if set, the body is streamed and at most max_body_size
+                       bytes of it are read: response.content is the part
+                       read, and response.truncated tells if the body was
+                       longer. The whole body is read if None.
+        item_validators: ItemValidators of the plan (optional). When the
+                         response is an array of definitions, its whole body
+                         is streamed and each item is validated as it arrives,
+                         whatever max_body_size: response.item_validation is the
+                         ArrayValidation of the body, and response.content is
+                         empty as the items are not kept.
+
+    Returns:
+        A tuple with the response and its RequestTiming.
 
     Raises:
-        ValueError: In case you specify neither a swagger.yaml path or an app URL.
+        requests.exceptions.RequestException: if no response was received.
+    """
+    reset_connect_time()
+    start = time.perf_counter()
+    validate_items = item_validators is not None and any(test_request.item_definitions)
+    response = session.request(test_request.method, test_request.full_path, headers=dict(test_request.headers),
+                               data=test_request.body, timeout=timeout,
+                               stream=max_body_size is not None or validate_items)
+    response.truncated = False
+    response.item_validation = None
+    check = item_validators.get(test_request, response.status_code) if validate_items else None
+    if check is not None:
+        try:
+            response.item_validation = validate_json_array(response.iter_content(chunk_size=READ_CHUNK_SIZE), check,
+                                                           max_failures=item_validators.max_failures)
+        finally:
+            response.close()
+        response._content = b''
+        response._content_consumed = True
+        size = response.item_validation.size
+    elif max_body_size is None:
+        size = len(response.content)
+    else:
+        body, response.truncated = read_response_body(response, max_body_size)
+        # Let response.content and response.json() use the part read
+        response._content = body
+        response._content_consumed = True
+        size = len(body)
+    # requests measures elapsed until the headers are parsed
+    return response, RequestTiming(get_connect_time(), response.elapsed.total_seconds(),
+                                   time.perf_counter() - start, size)
+
+
+def read_response_body(response, max_size):
+    """Read the body of a streamed response, up to max_size bytes, and close it.
+
+    A body read to its end gives its connection back to the pool, a longer
+    body is not downloaded further: its connection is closed.
+
+    Args:
+        response: requests response sent with stream=True.
+        max_size: maximum number of bytes to read.
+
+    Returns:
+        A tuple with the body read (bytes) and True if the body was longer than max_size.
     """
+    body = bytearray()
+    truncated = False
+    try:
+        for chunk in response.iter_content(chunk_size=min(READ_CHUNK_SIZE, max_size + 1)):
+            body += chunk
+            if len(body) > max_size:
+                del body[max_size:]
+                truncated = True
+                break
+    finally:
+        response.close()
+    return bytes(body), truncated
 
-    for status in swagger_test_yield(app_url=app_url, wait_time_between_tests=wait_time_between_tests, extra_headers=extra_headers, request=request):
-        # status_code, result = status.split(' ', 1)  # Split the status code and result message
 
-        # endpoint = result.split(' ')[-1]  # Extract the endpoint from the result message
+def send_test_request(session, test_request, rate_limiter=None, max_retries=3, timeouts=None, control=None,
+                      circuit_breakers=None, max_body_size=None, item_validators=None):
+    """Send the request of a test and check its status code against each expected one.
 
-        # if endpoint not in tested_status_codes:
-        #     tested_status_codes[endpoint] = set()  # Create a set to track status codes for the endpoint
+    Args:
+        session: requests session used to send the request.
+        test_request: PreparedRequest to send.
+        rate_limiter: RateLimiter to wait for before sending the request (optional).
+                      A request throttled by the server (429/503) is sent again
+                      once the limiter allows it.
+        max_retries: number of times a throttled request is sent again.
+        timeouts: RequestTimeouts of the request (optional).
+        control: RunControl of the run (optional). The request is not sent
+                 once the run is stopped, and its timeouts are cut to the
+                 time left before the deadline.
+        circuit_breakers: HostCircuitBreakers of the run (optional). The request
+                          is skipped while the circuit of its host is open.
+        max_body_size: maximum number of bytes read from the response body, see send_prepared_request.
+        item_validators: ItemValidators of the plan (optional). A response with the
+                         expected status code fails if any item of its array is
+                         invalid, the first invalid indices are in the message.
 
-        # if status_code in tested_status_codes[endpoint]:
-        #     continue  # Skip testing for already tested status codes
+    Returns:
+        A list with the TestResult of each expected status code of the request.
+    """
+    action = test_request.action
+    url = test_request.url
+    expected_status_codes = test_request.expected_status_codes
+    timeout = timeouts.get(test_request.operation) if timeouts is not None else None
+    breaker = circuit_breakers.get(test_request.full_path) if circuit_breakers is not None else None
+    for attempt in range(max_retries + 1):
+        if control is not None and control.stopped:
+            return _no_response_results(test_request, TestResult.TIMEOUT, "Not sent: run deadline exceeded")
+        # A skipped request does not take a token of the rate limiter
+        if breaker is not None and not breaker.allow():
+            return _no_response_results(test_request, TestResult.SKIPPED, f"Not sent: {breaker.host} is unreachable")
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        request_timeout = timeout
+        if control is not None:
+            if control.stopped:
+                # Stopped while waiting for the rate limiter
+                if breaker is not None:
+                    breaker.release_probe()
+                return _no_response_results(test_request, TestResult.TIMEOUT, "Not sent: run deadline exceeded")
+            request_timeout = control.timeout(timeout or (None, None))
+        try:
+            response, timing = send_prepared_request(session, test_request, timeout=request_timeout,
+                                                     max_body_size=max_body_size, item_validators=item_validators)
+        except requests.exceptions.Timeout as exc:
+            if breaker is not None:
+                # A read timeout still reached the host
+                if isinstance(exc, requests.exceptions.ConnectTimeout):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            return _no_response_results(test_request, TestResult.TIMEOUT, f"Timeout: {repr(exc)}")
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as exc:
+            if _is_read_timeout(exc):
+                # A timeout while reading the body, the host was reached
+                if breaker is not None:
+                    breaker.record_success()
+                return _no_response_results(test_request, TestResult.TIMEOUT, f"Timeout: {repr(exc)}")
+            if control is not None and control.stopped:
+                # A request aborted at the deadline or on cancellation tells nothing about the host
+                if breaker is not None:
+                    breaker.release_probe()
+                if control.expired:
+                    return _no_response_results(test_request, TestResult.TIMEOUT, f"Timeout: {repr(exc)}")
+            elif breaker is not None:
+                breaker.record_failure()
+            return [TestResult(TestResult.ERROR, f"Connection error: {repr(exc)}", test_request,
+                               expected_status_code=expected_status_code)
+                    for expected_status_code in expected_status_codes]
+        except Exception:
+            if breaker is not None:
+                breaker.release_probe()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+
+        if rate_limiter is None or not rate_limiter.observe(response):
+            break
+        if any(str(expected_status_code) == str(response.status_code) for expected_status_code in expected_status_codes):
+            break
+
+    results = []
+    item_validation = response.item_validation
+    for expected_status_code in expected_status_codes:
+        if (item_validation is not None and not item_validation.valid and
+                str(expected_status_code) == str(response.status_code)):
+            results.append(TestResult(TestResult.FAILED,
+                                      f"Returned: {response.status_code} Expected: {expected_status_code} FAILED {action.upper()} {url} ({item_validation})",
+                                      test_request, response.status_code, timing, expected_status_code))
+        elif str(expected_status_code) == str(response.status_code) or expected_status_code == 'default' or expected_status_code == '200':
+            results.append(TestResult(TestResult.PASSED,
+                                      f"Returned: {response.status_code} Expected: {expected_status_code} PASSED {action.upper()} {url}",
+                                      test_request, response.status_code, timing, expected_status_code))
+        else:
+            results.append(TestResult(TestResult.FAILED,
+                                      f"Returned: {response.status_code} Expected: {expected_status_code} FAILED {action.upper()} {url}",
+                                      test_request, response.status_code, timing, expected_status_code))
+    return results
 
-        # tested_status_codes[endpoint].add(status_code)  # Add the tested status code to the set
 
-        if 'PASSED' in status:
-            messages.success(request, f"{status}")
+def _no_response_results(test_request, outcome, reason):
+    """Get the results of the expected status codes of a request without response."""
+    return [TestResult(outcome,
+                       f"{reason} Expected: {expected_status_code} {outcome.upper()} {test_request.action.upper()} {test_request.url}",
+                       test_request, expected_status_code=expected_status_code)
+            for expected_status_code in test_request.expected_status_codes]
+
+
+def _is_read_timeout(exc):
+    """requests reports a read timeout in the body of a response as a ConnectionError."""
+    return bool(exc.args) and isinstance(exc.args[0], urllib3.exceptions.ReadTimeoutError)
+
+
+def swagger_test(app_url=None, wait_time_between_tests=0, extra_headers={}, request=None, session=None,
+                 concurrency=None, per_host_concurrency=None, in_order=False, workers=None,
+                 rate_limit=None, burst=1, timeouts=None, deadline=None):
+    """Test the given swagger api in this process, storing the results in a TestRun.
+
+    Args:
+        app_url: URL of the swagger api.
+        wait_time_between_tests: an number that will be used as waiting time between tests [in seconds].
+        extra_headers: additional headers you may want to send for all operations
+        request: if given, a message summing up the run is added to it.
+        session: requests session used for every request of the run (optional).
+        concurrency: maximum number of requests in flight, run sequentially if None.
+        per_host_concurrency: maximum number of requests in flight for one host.
+        in_order: report the results in the order of the tests.
+        workers: number of threads testing paths in parallel, keeping the order within a path.
+        rate_limit: maximum number of requests per second, adapted to 429/503 answers.
+        burst: number of requests which can be sent at once under rate_limit.
+        timeouts: RequestTimeouts of the requests, the ones of the settings if None.
+        deadline: maximum duration of the run [in seconds].
+
+    Returns:
+        The finished TestRun.
+
+    Raises:
+        ValueError: In case you specify neither a swagger.yaml path or an app URL.
+    """
+    run = TestRun.objects.create(swagger_url=app_url, concurrency=concurrency, workers=workers,
+                                 rate_limit=rate_limit, deadline=deadline, status=TestRun.RUNNING,
+                                 started_at=timezone.now())
+    recorder = RunRecorder(run)
+    load_error = None
+    try:
+        for status in iter_test_results(app_url=app_url, wait_time_between_tests=wait_time_between_tests, extra_headers=extra_headers, request=request, session=session,
+                                        concurrency=concurrency, per_host_concurrency=per_host_concurrency,
+                                        in_order=in_order, workers=workers, rate_limit=rate_limit,
+                                        burst=burst, timeouts=timeouts, deadline=deadline):
+            # status_code, result = status.split(' ', 1)  # Split the status code and result message
+
+            # endpoint = result.split(' ')[-1]  # Extract the endpoint from the result message
+
+            # if endpoint not in tested_status_codes:
+            #     tested_status_codes[endpoint] = set()  # Create a set to track status codes for the endpoint
+
+            # if status_code in tested_status_codes[endpoint]:
+            #     continue  # Skip testing for already tested status codes
+
+            # tested_status_codes[endpoint].add(status_code)  # Add the tested status code to the set
+
+            recorder.add(status)
+        recorder.close()
+    except SwaggerLoadError as exc:
+        load_error = str(exc)
+        TestRun.objects.filter(pk=run.pk).update(status=TestRun.FAILED, error=load_error, finished_at=timezone.now())
+    except Exception as exc:
+        logger.exception(f"Run {run.pk} failed")
+        TestRun.objects.filter(pk=run.pk).update(status=TestRun.FAILED, error=repr(exc), finished_at=timezone.now())
+    else:
+        TestRun.objects.filter(pk=run.pk).update(status=TestRun.DONE, total=F('completed'), finished_at=timezone.now())
+    run.refresh_from_db()
+    if request is not None:
+        summary = f"{run.passed} passed, {run.failed} failed: {reverse('run_view', args=[run.pk])}"
+        if load_error is not None:
+            messages.error(request, load_error)
+        elif run.status == TestRun.FAILED:
+            messages.error(request, f"The run failed: {run.error}")
+        elif run.failed:
+            messages.error(request, summary)
         else:
-            messages.error(request, f"{status}")
+            messages.success(request, summary)
+    return run
@@ -1,8 +1,16 @@
+import csv
+
 from django.contrib import messages
-from django.shortcuts import render
+from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
 from django.views import View
+from app.events import iter_run_events
 from app.forms import URLProcessingForm
-from app.utils import swagger_test
+from app.latency import LatencyReport
+from app.models import TestRun, TestRunResult
 
 class URLProcessingView(View):
     template_name = 'main.html'
@@ -14,9 +22,134 @@ class URLProcessingView(View):
     def post(self, request):
         form = URLProcessingForm(request.POST)
         if form.is_valid():
-            swagger_url = form.cleaned_data['swagger_url']
-            swagger_test(app_url=swagger_url, request=request)
-            return render(request, self.template_name, {'form': form})
+            # The tests are run by the run_test_worker command
+            run = TestRun.objects.create(swagger_url=form.cleaned_data['swagger_url'],
+                                         concurrency=form.cleaned_data['concurrency'],
+                                         workers=form.cleaned_data['workers'],
+                                         rate_limit=form.cleaned_data['rate_limit'],
+                                         deadline=form.cleaned_data['deadline'])
+            if accepts_json(request):
+                return JsonResponse({'id': run.pk,
+                                     'url': reverse('run_view', args=[run.pk]),
+                                     'status_url': reverse('run_status', args=[run.pk]),
+                                     'events_url': reverse('run_events', args=[run.pk]),
+                                     'cancel_url': reverse('run_cancel', args=[run.pk])}, status=202)
+            return redirect('run_view', pk=run.pk)
         else:
+            if accepts_json(request):
+                return JsonResponse({'errors': form.errors}, status=400)
             messages.error(request, f"Please enter a valid URL.")
             return render(request, self.template_name, {'form': form})
+
+
+class RunView(View):
+    template_name = 'run.html'
+    paginate_by = 100
+
+    def get(self, request, pk):
+        run = get_object_or_404(TestRun, pk=pk)
+        context = {'run': run}
+        # The results of a running run are streamed by the page
+        if run.is_finished:
+            outcome = request.GET.get('outcome', '')
+            operation = request.GET.get('operation', '')
+            results = run.results.only('outcome', 'message')
+            if outcome:
+                results = results.filter(outcome=outcome)
+            if operation:
+                results = results.filter(operation=operation)
+            page = Paginator(results, self.paginate_by).get_page(request.GET.get('page'))
+
+            query = request.GET.copy()
+            query.pop('page', None)
+            context.update({
+                'page': page,
+                'results': page.object_list,
+                'outcome': outcome,
+                'operation': operation,
+                'outcomes': TestRunResult.OUTCOME_CHOICES,
+                'operations': run.results.order_by('operation').values_list('operation', flat=True).distinct(),
+                'query': query.urlencode(),
+                'latency': LatencyReport.from_dict(run.latency).summary(),
+            })
+        return render(request, self.template_name, context)
+
+
+class RunStatusView(View):
+
+    def get(self, request, pk):
+        run = get_object_or_404(TestRun.objects.only(
+            'status', 'total', 'completed', 'passed', 'failed', 'error'), pk=pk)
+        return JsonResponse(run.progress())
+
+
+class RunCancelView(View):
+    """Cancel a queued or running run, its worker aborts the requests in flight."""
+
+    def post(self, request, pk):
+        run = get_object_or_404(TestRun.objects.only('pk'), pk=pk)
+        TestRun.objects.filter(pk=pk, status__in=(TestRun.QUEUED, TestRun.RUNNING)).update(
+            status=TestRun.CANCELLED, finished_at=timezone.now())
+        if accepts_json(request):
+            run.refresh_from_db()
+            return JsonResponse(run.progress())
+        return redirect('run_view', pk=pk)
+
+
+class RunEventsView(View):
+    """Stream the results of a run as server-sent events."""
+
+    def get(self, request, pk):
+        get_object_or_404(TestRun.objects.only('pk'), pk=pk)
+        try:
+            last_id = int(request.headers.get('Last-Event-ID', 0))
+        except ValueError:
+            last_id = 0
+        response = StreamingHttpResponse(iter_run_events(pk, last_id=last_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Do not let a proxy buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class RunLatencyView(View):
+    """Export the latency percentiles and histograms of each operation of a run as JSON."""
+
+    def get(self, request, pk):
+        run = get_object_or_404(TestRun.objects.only('latency'), pk=pk)
+        report = LatencyReport.from_dict(run.latency)
+        response = JsonResponse({'id': run.pk, 'summary': report.summary(), 'histograms': report.to_dict()})
+        response['Content-Disposition'] = f'attachment; filename="run-{run.pk}-latency.json"'
+        return response
+
+
+class RunTimingsView(View):
+    """Export the timing of every request of a run as CSV."""
+
+    columns = ['id', 'operation', 'outcome', 'status_code', 'connect_time', 'ttfb', 'total_time',
+               'response_size', 'message']
+
+    def get(self, request, pk):
+        run = get_object_or_404(TestRun.objects.only('pk'), pk=pk)
+        writer = csv.writer(_Echo())
+        rows = run.results.order_by('pk').values_list(*self.columns).iterator()
+        response = StreamingHttpResponse((writer.writerow(row) for row in _with_header(self.columns, rows)),
+                                         content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="run-{run.pk}-timings.csv"'
+        return response
+
+
+class _Echo(object):
+    """File-like object returning what is written, to stream csv.writer rows."""
+
+    def write(self, value):
+        return value
+
+
+def _with_header(header, rows):
+    yield header
+    yield from rows
+
+
+def accepts_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
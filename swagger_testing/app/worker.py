@@ -0,0 +1,183 @@
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.models import TestRun, TestRunResult
+from app.results import RunRecorder
+from app.run_control import RunControl
+from app.thread_runner import PathPoolStats
+from app.utils import (SwaggerLoadError, build_runner_session, get_circuit_breakers, get_item_validators,
+                       get_request_timeouts, load_test_plan, run_test_plan)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the cancellation of the running run
+CANCEL_POLL_INTERVAL = 1.0
+
+
+def claim_next_run():
+    """Take the oldest queued run, making sure no other worker takes it.
+
+    The stale runs are queued again first, see requeue_stale_runs.
+
+    Returns:
+        The TestRun now running, or None if no run is queued.
+    """
+    requeue_stale_runs()
+    queued = TestRun.objects.filter(status=TestRun.QUEUED).order_by('created_at').values_list('pk', flat=True)
+    for run_id in queued[:10]:
+        now = timezone.now()
+        claimed = TestRun.objects.filter(pk=run_id, status=TestRun.QUEUED).update(
+            status=TestRun.RUNNING, started_at=now, heartbeat_at=now)
+        if claimed:
+            return TestRun.objects.get(pk=run_id)
+    return None
+
+
+def requeue_stale_runs(stale_after=None):
+    """Queue again the running runs whose worker stopped refreshing their heartbeat (ex: crashed).
+
+    The results of the interrupted attempt are deleted, the run starts over.
+
+    Args:
+        stale_after: number of seconds without heartbeat after which a run is
+                     stale, SWAGGER_WORKER_STALE_AFTER if None.
+
+    Returns:
+        The number of runs queued again.
+    """
+    if stale_after is None:
+        stale_after = getattr(settings, 'SWAGGER_WORKER_STALE_AFTER', 60)
+    stale_at = timezone.now() - datetime.timedelta(seconds=stale_after)
+    # Runs claimed before the heartbeat existed only have a start time
+    stale = TestRun.objects.filter(Q(heartbeat_at__lt=stale_at) | Q(heartbeat_at__isnull=True, started_at__lt=stale_at),
+                                   status=TestRun.RUNNING)
+    requeued = 0
+    for run_id, started_at in stale.values_list('pk', 'started_at'):
+        with transaction.atomic():
+            # Unless its worker refreshed it or another worker requeued it meanwhile
+            if not stale.filter(pk=run_id, started_at=started_at).update(
+                    status=TestRun.QUEUED, started_at=None, heartbeat_at=None, total=0, completed=0,
+                    passed=0, failed=0, latency={}):
+                continue
+            TestRunResult.objects.filter(run_id=run_id).delete()
+        logger.warning(f"Run {run_id} has no heartbeat since {stale_after}s, queued again")
+        requeued += 1
+    return requeued
+
+
+def run_worker(poll_interval=1.0, once=False):
+    """Execute the queued runs, waiting for new ones when the queue is empty.
+
+    Args:
+        poll_interval: number of seconds between two checks of an empty queue.
+        once: if True, return as soon as the queue is empty.
+    """
+    while True:
+        run = claim_next_run()
+        if run is not None:
+            execute_run(run)
+        elif once:
+            return
+        else:
+            time.sleep(poll_interval)
+
+
+def execute_run(run):
+    """Run the tests of a claimed run and store its results.
+
+    Args:
+        run: TestRun to execute.
+    """
+    logger.info(f"Starting run {run.pk} of {run.swagger_url}")
+    session = build_runner_session(run.concurrency or run.workers or 0)
+    timeouts = get_request_timeouts()
+    # The deadline and the cancellation cover the fetch of the specification too
+    control = RunControl(session, deadline=run.deadline or getattr(settings, 'SWAGGER_TEST_RUN_DEADLINE', None))
+    watcher = threading.Thread(target=watch_run, args=(run, control), daemon=True)
+    watcher.start()
+    try:
+        try:
+            plan = load_test_plan(run.swagger_url, session=session, timeouts=timeouts, control=control)
+        except SwaggerLoadError as exc:
+            if control.cancelled:
+                logger.info(f"Run {run.pk} cancelled")
+            elif control.expired:
+                _finish(run, TestRun.FAILED, error="The deadline passed while fetching the specification")
+            else:
+                _finish(run, TestRun.FAILED, error=str(exc))
+            return
+
+        TestRun.objects.filter(pk=run.pk).update(total=plan.operations)
+
+        recorder = RunRecorder(run)
+        stats = PathPoolStats() if run.workers else None
+        for result in run_test_plan(plan, session, concurrency=run.concurrency, in_order=True,
+                                    workers=run.workers, rate_limit=run.rate_limit, stats=stats,
+                                    timeouts=timeouts, control=control,
+                                    circuit_breakers=get_circuit_breakers(),
+                                    max_body_size=getattr(settings, 'SWAGGER_TEST_MAX_BODY_SIZE', None),
+                                    item_validators=get_item_validators(plan)):
+            recorder.add(result)
+        recorder.close()
+        if stats is not None:
+            logger.info(f"Run {run.pk}: {stats}")
+        if control.cancelled:
+            logger.info(f"Run {run.pk} cancelled")
+        else:
+            _finish(run, TestRun.DONE, completed=plan.operations)
+    except Exception as exc:
+        logger.exception(f"Run {run.pk} failed")
+        _finish(run, TestRun.FAILED, error=repr(exc))
+    finally:
+        control.close()
+        watcher.join()
+        session.close()
+
+
+def watch_run(run, control, poll_interval=CANCEL_POLL_INTERVAL, heartbeat_interval=None):
+    """Refresh the heartbeat of a run and cancel its control once the run is cancelled, until the run is over.
+
+    The control is cancelled too if the run was queued again by another
+    worker, which took its heartbeat for a crash.
+
+    Args:
+        run: running TestRun, as claimed.
+        control: RunControl of the run.
+        poll_interval: number of seconds between two checks of the run.
+        heartbeat_interval: number of seconds between two heartbeats,
+                            SWAGGER_WORKER_HEARTBEAT_INTERVAL if None.
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = getattr(settings, 'SWAGGER_WORKER_HEARTBEAT_INTERVAL', 10)
+    heartbeat_at = time.monotonic() + heartbeat_interval
+    try:
+        while not control.wait_closed(poll_interval):
+            if TestRun.objects.filter(pk=run.pk, status=TestRun.CANCELLED).exists():
+                control.cancel()
+                return
+            if time.monotonic() >= heartbeat_at:
+                heartbeat_at = time.monotonic() + heartbeat_interval
+                if not _claimed(run).update(heartbeat_at=timezone.now()) and not control.wait_closed(0):
+                    logger.warning(f"Run {run.pk} was queued again, stopping it")
+                    control.cancel()
+                    return
+    finally:
+        connection.close()
+
+
+def _claimed(run):
+    # The run while it is still the attempt claimed by this worker
+    return TestRun.objects.filter(pk=run.pk, status=TestRun.RUNNING, started_at=run.started_at)
+
+
+def _finish(run, status, **fields):
+    # A cancelled run keeps its status, a run queued again is left to the worker that took it
+    _claimed(run).update(status=status, finished_at=timezone.now(), **fields)
+
@@ -0,0 +1,244 @@
+"""Benchmark SwaggerParser on synthetic specifications.
+
+Run from the swagger_testing directory:
+
+    python -m benchmarks.parser_benchmark --paths 10000 --definitions 5000
+    python -m benchmarks.parser_benchmark --save benchmarks/baseline.json
+    python -m benchmarks.parser_benchmark --compare benchmarks/baseline.json
+
+Each phase is timed (best of --repeat runs), then run once more under
+tracemalloc to measure the memory it allocates. --scales runs the phases on
+several sizes of specification to report how each phase scales.
+"""
+
+import argparse
+import gc
+import json
+import math
+import platform
+import re
+import sys
+import time
+import tracemalloc
+
+from app.swagger_parser import SwaggerParser
+from benchmarks.spec_generator import generate_spec
+
+_PATH_PARAMETER_REGEX = re.compile(r'{[^/}]+}')
+
+# Number of definitions matched with get_dict_definition, which tests every candidate definition
+DICT_DEFINITION_SAMPLE = 500
+
+
+class Phase(object):
+    """Phase of the benchmark.
+
+    Attributes:
+        name: name of the phase.
+        setup: function returning the state the phase works on.
+        run: function running the phase on the state returned by setup.
+    """
+
+    __slots__ = ('name', 'setup', 'run')
+
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def build_phases(spec):
+    """Get the phases benchmarked on the given specification."""
+    def lazy_parser():
+        return SwaggerParser(swagger_dict=spec, lazy=True)
+
+    def parser_with_examples():
+        swagger_parser = lazy_parser()
+        swagger_parser.build_definitions_example()
+        return swagger_parser
+
+    def path_lookups():
+        swagger_parser = lazy_parser()
+        requests = []
+        for path_name, path_spec in swagger_parser.paths.items():
+            path = _PATH_PARAMETER_REGEX.sub('42', path_name)
+            for action in path_spec:
+                requests.append((path, action))
+        return swagger_parser, requests
+
+    def run_path_lookups(state):
+        swagger_parser, requests = state
+        for path, action in requests:
+            swagger_parser.get_path_spec(path, action)
+
+    def run_validate_definition(swagger_parser):
+        for definition_name, example in swagger_parser.definitions_example.items():
+            swagger_parser.validate_definition(definition_name, example)
+
+    def run_get_dict_definition(swagger_parser):
+        examples = list(swagger_parser.definitions_example.values())[:DICT_DEFINITION_SAMPLE]
+        for example in examples:
+            swagger_parser.get_dict_definition(example, get_list=True)
+
+    return [
+        Phase('init', lambda: None, lambda state: lazy_parser()),
+        Phase('examples', lazy_parser, lambda swagger_parser: swagger_parser.build_definitions_example()),
+        Phase('get_path_spec', path_lookups, run_path_lookups),
+        Phase('validate_definition', parser_with_examples, run_validate_definition),
+        Phase('get_dict_definition', parser_with_examples, run_get_dict_definition),
+    ]
+
+
+def time_phase(phase, repeat):
+    """Get the best duration of a phase over repeat runs [in seconds]."""
+    best = None
+    for _ in range(repeat):
+        state = phase.setup()
+        gc.collect()
+        start = time.perf_counter()
+        phase.run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_phase_memory(phase):
+    """Get the memory allocated by a phase.
+
+    Returns:
+        A tuple with the peak of memory allocated during the phase and the
+        memory still allocated at its end (e.g. the parser built) [in bytes].
+    """
+    state = phase.setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = phase.run(state)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+def run_benchmark(paths, definitions, depth, refs, nesting, seed, repeat):
+    """Run every phase on a generated specification.
+
+    Returns:
+        A dict of the results of each phase by name.
+    """
+    start = time.perf_counter()
+    spec = generate_spec(paths=paths, definitions=definitions, depth=depth, refs=refs, nesting=nesting, seed=seed)
+    results = {'generate': {'seconds': time.perf_counter() - start}}
+    for phase in build_phases(spec):
+        seconds = time_phase(phase, repeat)
+        peak, retained = measure_phase_memory(phase)
+        results[phase.name] = {'seconds': seconds, 'peak_bytes': peak, 'retained_bytes': retained}
+    return results
+
+
+def format_results(size, results, baseline=None, tolerance=0.2):
+    """Format the results of one size of specification, compared to a baseline if given.
+
+    Returns:
+        A tuple with the lines of the table and the names of the phases slower
+        than the baseline by more than tolerance.
+    """
+    lines = [f"{size}",
+             f"  {'phase':<22}{'seconds':>10}{'peak MB':>10}{'kept MB':>10}" + (f"{'baseline':>10}{'ratio':>8}" if baseline else "")]
+    regressions = []
+    for name, result in results.items():
+        line = (f"  {name:<22}{result['seconds']:>10.4f}{_megabytes(result.get('peak_bytes')):>10}"
+                f"{_megabytes(result.get('retained_bytes')):>10}")
+        if baseline and name in baseline:
+            ratio = result['seconds'] / baseline[name]['seconds'] if baseline[name]['seconds'] else 1.0
+            flag = ''
+            if ratio > 1 + tolerance and name != 'generate':
+                flag = '  REGRESSION'
+                regressions.append(f"{size} {name}")
+            line += f"{baseline[name]['seconds']:>10.4f}{ratio:>8.2f}{flag}"
+        lines.append(line)
+    return lines, regressions
+
+
+def format_scaling(runs):
+    """Format the scaling exponent of each phase between the smallest and largest specification.
+
+    An exponent of 1 means the phase is linear in the size of the specification.
+    """
+    sizes = sorted(runs, key=lambda size: runs[size]['config']['paths'])
+    smallest, largest = runs[sizes[0]], runs[sizes[-1]]
+    growth = largest['config']['paths'] / float(smallest['config']['paths'])
+    lines = [f"Scaling from {sizes[0]} to {sizes[-1]} (time ~ size^exponent)"]
+    for name, result in largest['phases'].items():
+        before = smallest['phases'][name]['seconds']
+        if before <= 0 or result['seconds'] <= 0 or growth <= 1:
+            continue
+        lines.append(f"  {name:<22}{math.log(result['seconds'] / before) / math.log(growth):>6.2f}")
+    return lines
+
+
+def _megabytes(value):
+    if value is None:
+        return '-'
+    return f"{value / 1048576.0:.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark SwaggerParser on synthetic specifications.')
+    parser.add_argument('--paths', type=int, default=10000, help='Number of paths of the specification.')
+    parser.add_argument('--definitions', type=int, default=5000, help='Number of definitions.')
+    parser.add_argument('--depth', type=int, default=6, help='Levels of definitions referencing each other.')
+    parser.add_argument('--refs', type=int, default=2, help='Definitions referenced by each definition.')
+    parser.add_argument('--nesting', type=int, default=3, help='Depth of the inline objects of a definition.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the specification generator.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs of each phase.')
+    parser.add_argument('--scales', default='1',
+                        help='Comma separated factors applied to --paths and --definitions, e.g. 0.1,0.5,1.')
+    parser.add_argument('--save', metavar='FILE', help='Save the results as a baseline.')
+    parser.add_argument('--compare', metavar='FILE', help='Compare the results with a saved baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Slowdown ratio over the baseline reported as a regression.')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    runs = {}
+    regressions = []
+    for scale in [float(scale) for scale in args.scales.split(',')]:
+        config = {'paths': max(int(args.paths * scale), 1), 'definitions': max(int(args.definitions * scale), 1),
+                  'depth': args.depth, 'refs': args.refs, 'nesting': args.nesting, 'seed': args.seed}
+        size = f"{config['paths']} paths, {config['definitions']} definitions"
+        phases = run_benchmark(repeat=args.repeat, **config)
+        runs[size] = {'config': config, 'phases': phases}
+
+        baseline_phases = None
+        if baseline is not None:
+            baseline_run = baseline['runs'].get(size)
+            if baseline_run is None or baseline_run['config'] != config:
+                print(f"No baseline for {size} with this configuration", file=sys.stderr)
+            else:
+                baseline_phases = baseline_run['phases']
+        lines, size_regressions = format_results(size, phases, baseline_phases, args.tolerance)
+        regressions.extend(size_regressions)
+        print('\n'.join(lines))
+
+    if len(runs) > 1:
+        print('\n'.join(format_scaling(runs)))
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump({'python': platform.python_version(), 'runs': runs}, baseline_file, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if regressions:
+        print(f"Regressions over {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
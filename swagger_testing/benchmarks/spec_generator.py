@@ -0,0 +1,126 @@
+import random
+
+_PRIMITIVES = [
+    {'type': 'integer'},
+    {'type': 'integer', 'format': 'int64'},
+    {'type': 'number', 'format': 'float'},
+    {'type': 'string'},
+    {'type': 'string', 'format': 'date-time'},
+    {'type': 'string', 'enum': ['available', 'pending', 'sold']},
+    {'type': 'boolean'},
+    {'type': 'array', 'items': {'type': 'string'}},
+]
+
+
+def generate_spec(paths=10000, definitions=5000, depth=6, refs=2, nesting=3, seed=0):
+    """Generate a synthetic swagger 2.0 specification.
+
+    Definitions are split in depth levels: a definition references (with
+    $ref, directly, in arrays or in allOf) definitions of the next level
+    only, so the references nest depth levels deep without cycles. Paths use
+    path, query, header and body parameters, shared parameters and responses,
+    and $ref schemas. The same arguments always give the same specification.
+
+    Args:
+        paths: number of paths.
+        definitions: number of definitions.
+        depth: number of levels of definitions referencing each other.
+        refs: number of definitions referenced by each definition.
+        nesting: depth of the inline objects nested in a definition.
+        seed: seed of the random generator.
+
+    Returns:
+        The specification as a dict.
+    """
+    rng = random.Random(seed)
+    depth = max(min(depth, definitions), 1)
+    names = [f"Definition{index}" for index in range(definitions)]
+    levels = [names[level::depth] for level in range(depth)]
+
+    spec_definitions = {}
+    for level, level_names in enumerate(levels):
+        next_level = levels[level + 1] if level + 1 < depth else []
+        for name in level_names:
+            spec_definitions[name] = _definition(rng, next_level, refs, nesting)
+
+    spec_paths = {}
+    for index in range(paths):
+        spec_paths[_path(rng, index)] = _path_item(rng, names)
+
+    return {
+        'swagger': '2.0',
+        'info': {'title': 'Synthetic', 'version': '1.0'},
+        'host': 'localhost:8000',
+        'basePath': '/v1',
+        'schemes': ['http'],
+        'parameters': {
+            'limitParam': {'name': 'limit', 'in': 'query', 'type': 'integer'},
+            'offsetParam': {'name': 'offset', 'in': 'query', 'type': 'integer'},
+        },
+        'responses': {
+            'NotFound': {'description': 'Not found'},
+            'BadRequest': {'description': 'Bad request'},
+        },
+        'definitions': spec_definitions,
+        'paths': spec_paths,
+    }
+
+
+def _definition(rng, referenced_names, refs, nesting):
+    properties = {}
+    for index in range(rng.randint(3, 8)):
+        properties[f"field{index}"] = dict(rng.choice(_PRIMITIVES))
+    if nesting > 0:
+        properties['nested'] = _definition(rng, [], 0, nesting - 1)
+
+    references = rng.sample(referenced_names, min(refs, len(referenced_names)))
+    for index, referenced_name in enumerate(references):
+        ref = {'$ref': f"#/definitions/{referenced_name}"}
+        if index % 2:
+            properties[f"items{index}"] = {'type': 'array', 'items': ref}
+        else:
+            properties[f"ref{index}"] = ref
+
+    definition = {'type': 'object', 'properties': properties}
+    required = [name for name in properties if rng.random() < 0.3]
+    if required:
+        definition['required'] = required
+    if rng.random() < 0.1:
+        definition['additionalProperties'] = {'type': 'string'}
+    if references and rng.random() < 0.1:
+        return {'allOf': [{'$ref': f"#/definitions/{references[0]}"}, definition]}
+    return definition
+
+
+def _path(rng, index):
+    segments = [f"resource{index}"]
+    for level in range(rng.randint(0, 3)):
+        segments.append(f"{{id{level}}}")
+        segments.append(f"sub{rng.randint(0, 9)}")
+    if rng.random() < 0.5:
+        segments.append(f"{{id{len(segments)}}}")
+    return '/' + '/'.join(segments)
+
+
+def _path_item(rng, names):
+    path_item = {}
+    for method in rng.sample(['get', 'post', 'put', 'delete'], rng.randint(1, 3)):
+        name = rng.choice(names)
+        operation = {
+            'parameters': [{'$ref': '#/parameters/limitParam'}],
+            'responses': {
+                '200': {'description': 'OK', 'schema': {'$ref': f"#/definitions/{name}"}},
+                '400': {'$ref': '#/responses/BadRequest'},
+                '404': {'$ref': '#/responses/NotFound'},
+            },
+        }
+        if method in ('post', 'put'):
+            operation['parameters'].append({'name': 'body', 'in': 'body', 'required': True,
+                                            'schema': {'$ref': f"#/definitions/{name}"}})
+        elif method == 'get' and rng.random() < 0.3:
+            operation['responses']['200']['schema'] = {'type': 'array',
+                                                      'items': {'$ref': f"#/definitions/{name}"}}
+        if rng.random() < 0.2:
+            operation['parameters'].append({'name': 'X-Request-Id', 'in': 'header', 'type': 'string'})
+        path_item[method] = operation
+    return path_item
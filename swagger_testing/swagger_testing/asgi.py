@@ -7,10 +7,63 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
-from django.core.asgi import get_asgi_application
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'swagger_testing.settings')
 
-application = get_asgi_application()
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGI handler reading streaming responses in a thread.
+
+    Django 3.2 iterates streaming responses in the event loop, so a stream
+    waiting for its next part (like the events of a run) would block every
+    other request. Each streaming response is read by a thread of its own.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for c in response.cookies.values():
+            response_headers.append((b'Set-Cookie', c.output(header='').encode('ascii').strip()))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1)
+        parts = iter(response)
+        try:
+            while True:
+                part = await loop.run_in_executor(executor, next, parts, None)
+                if part is None:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body'})
+        finally:
+            # Close the iterator in its thread, to release what it holds there
+            await loop.run_in_executor(executor, response.close)
+            executor.shutdown(wait=False)
+        await sync_to_async(close_old_connections, thread_sensitive=True)()
+
+
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
@@ -122,6 +122,67 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Swagger test runner
+# On-disk cache of parsed swagger specifications
+
+SWAGGER_PARSE_CACHE_DIR = BASE_DIR / 'cache' / 'parsed'
+
+SWAGGER_PARSE_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+# HTTP cache of fetched swagger specifications, revalidated with ETag / Last-Modified
+# once older than SWAGGER_SPEC_CACHE_MAX_AGE seconds
+
+SWAGGER_SPEC_CACHE_DIR = BASE_DIR / 'cache' / 'specs'
+
+SWAGGER_SPEC_CACHE_MAX_AGE = 0
+
+# Connections kept alive per host by the test runner session, and number of hosts pooled
+
+SWAGGER_TEST_POOL_SIZE = 10
+
+SWAGGER_TEST_POOL_HOSTS = 10
+
+# Timeouts of each test request in seconds: to connect, and to wait for each byte of the response.
+# SWAGGER_TEST_OPERATION_TIMEOUTS overrides them by operation id, with a (connect, read) pair or a read timeout,
+# e.g. {'findPetsByStatus': 60}
+
+SWAGGER_TEST_CONNECT_TIMEOUT = 5
+
+SWAGGER_TEST_READ_TIMEOUT = 30
+
+SWAGGER_TEST_OPERATION_TIMEOUTS = {}
+
+# Maximum duration of a run in seconds (None for no limit), when the run does not set its own deadline.
+# The tests not sent in time are reported as timed out.
+
+SWAGGER_TEST_RUN_DEADLINE = 15 * 60
+
+# Circuit breaker of each host tested: after SWAGGER_TEST_CIRCUIT_BREAKER_FAILURES connection failures in a row,
+# the requests to the host are skipped, and one request probes it every SWAGGER_TEST_CIRCUIT_BREAKER_RECOVERY seconds
+
+SWAGGER_TEST_CIRCUIT_BREAKER_FAILURES = 5
+
+SWAGGER_TEST_CIRCUIT_BREAKER_RECOVERY = 10
+
+# Maximum number of bytes read from each response body, the rest is not downloaded (None to read whole bodies)
+
+SWAGGER_TEST_MAX_BODY_SIZE = 1024 * 1024
+
+# Validate every item of the array responses while they are streamed, one item in memory at a time,
+# whatever SWAGGER_TEST_MAX_BODY_SIZE. The indices of the first SWAGGER_TEST_MAX_INVALID_ITEMS invalid
+# items are reported
+
+SWAGGER_TEST_VALIDATE_ARRAY_ITEMS = True
+
+SWAGGER_TEST_MAX_INVALID_ITEMS = 10
+
+# Test workers: a worker refreshes the heartbeat of its run every SWAGGER_WORKER_HEARTBEAT_INTERVAL seconds,
+# a running run without heartbeat for SWAGGER_WORKER_STALE_AFTER seconds (crashed worker) is queued again
+
+SWAGGER_WORKER_HEARTBEAT_INTERVAL = 10
+
+SWAGGER_WORKER_STALE_AFTER = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -16,9 +16,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-from app.views import URLProcessingView
+from app.views import (RunCancelView, RunEventsView, RunLatencyView, RunStatusView, RunTimingsView, RunView,
+                       URLProcessingView)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', URLProcessingView.as_view(), name='main_view'),
+    path('runs/<int:pk>/', RunView.as_view(), name='run_view'),
+    path('runs/<int:pk>/status/', RunStatusView.as_view(), name='run_status'),
+    path('runs/<int:pk>/events/', RunEventsView.as_view(), name='run_events'),
+    path('runs/<int:pk>/cancel/', RunCancelView.as_view(), name='run_cancel'),
+    path('runs/<int:pk>/latency.json', RunLatencyView.as_view(), name='run_latency'),
+    path('runs/<int:pk>/timings.csv', RunTimingsView.as_view(), name='run_timings'),
 ]